@@ -0,0 +1,113 @@
+# admin.py
+# Bulk seat operations for admins: release or re-price every seat matching a
+# filter (floor, zone, booked before a time) in one request instead of one
+# /release call per seat.
+#
+# A release streams the matching seats off a cursor in batches. Each batch is
+# freed with one write and its holders refunded with one more (update_many
+# and an unordered bulk_write on Mongo) while the next batch is already being
+# read; at most two batches are in memory, however many seats match.
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+import invalidation
+from auth import get_current_user
+from repository import get_repository
+from schemas import SEAT_COST
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# ENV
+ADMIN_W3_IDS = {w.strip() for w in os.getenv("ADMIN_W3_IDS", "").split(",") if w.strip()}
+ADMIN_BATCH_SIZE = int(os.getenv("ADMIN_BATCH_SIZE", "1000"))
+
+
+async def require_admin(user=Depends(get_current_user)):
+    if user["w3_id"] not in ADMIN_W3_IDS:
+        raise HTTPException(status_code=403, detail="Admins only")
+    return user
+
+
+# MODELS
+class SeatFilter(BaseModel):
+    floor: Optional[int] = None
+    zone: Optional[str] = None
+    # only bookings made before this time (UTC)
+    booked_before: Optional[datetime] = None
+
+    def criteria(self) -> dict:
+        criteria = self.model_dump(include={"floor", "zone", "booked_before"}, exclude_none=True)
+        if not criteria:
+            raise HTTPException(status_code=400, detail="Give at least one of floor, zone, booked_before")
+        return criteria
+
+
+class RepriceRequest(SeatFilter):
+    price: int = Field(ge=0)
+
+
+# PIPELINE
+async def release_batch(repo, seats: List[dict]) -> dict:
+    # Pin each seat to the holder we read: one released and rebooked in the
+    # meantime belongs to someone else now and is left alone.
+    released = await repo.release_seats(seats)
+    # Refund only while the employee still lists the seat, as /release does,
+    # so a concurrent self-release and this never both refund.
+    refunded = await repo.refund_bookings(seats, SEAT_COST)
+    bus = invalidation.get_bus()
+    bus.publish("seats")
+    bus.publish("employees")
+    return {"released": released, "refunded": refunded}
+
+
+async def release_matching(repo, criteria: dict, batch_size: int = ADMIN_BATCH_SIZE) -> dict:
+    """Release every occupied seat matching ``criteria``; reading the next
+    batch overlaps with writing the current one."""
+    totals = {"matched": 0, "released": 0, "refunded": 0, "batches": 0}
+    pending: Optional[asyncio.Task] = None
+    try:
+        async for batch in repo.occupied_batches(criteria, batch_size):
+            if pending is not None:
+                for key, value in (await pending).items():
+                    totals[key] += value
+            totals["matched"] += len(batch)
+            totals["batches"] += 1
+            pending = asyncio.create_task(release_batch(repo, batch))
+        if pending is not None:
+            for key, value in (await pending).items():
+                totals[key] += value
+            pending = None
+    finally:
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+    return totals
+
+
+# ROUTES
+@router.post("/seats/release")
+async def release_seats(
+    payload: SeatFilter,
+    admin=Depends(require_admin),
+    repo=Depends(get_repository),
+):
+    started = time.perf_counter()
+    totals = await release_matching(repo, payload.criteria())
+    totals["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return totals
+
+
+@router.post("/seats/price")
+async def reprice_seats(
+    payload: RepriceRequest,
+    admin=Depends(require_admin),
+    repo=Depends(get_repository),
+):
+    matched, updated = await repo.reprice_seats(payload.criteria(), payload.price)
+    invalidation.get_bus().publish("seats")
+    return {"matched": matched, "updated": updated}
@@ -1,14 +1,16 @@
 # auth.py
 import os
-import requests
-from jose import jwt
+import logging
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from motor.motor_asyncio import AsyncIOMotorClient
-from schemas import employee_document
+from repository import get_repository
+from invalidation import get_bus
+import cache
+import tracing
 
 router = APIRouter(prefix="/auth")
+logger = logging.getLogger(__name__)
 
 # ENV
 CLIENT_ID = os.getenv("CLIENT_ID", "")
@@ -19,12 +21,6 @@ JWKS_URL = os.getenv("JWKS_URL", "")
 JWT_ISSUER = os.getenv("JWT_ISSUER", "")
 REDIRECT_URI = os.getenv("REDIRECT_URI", "")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://127.0.0.1:5173")
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-
-# DB
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.office_booking_db
-employees_collection = db.employees
 
 # ---------------- LOGIN ----------------
 @router.get("/login")
@@ -40,7 +36,12 @@ def login():
 
 # ---------------- CALLBACK ----------------
 @router.get("/ibm/callback")
-async def callback(request: Request, code: Optional[str] = None, error: Optional[str] = None):
+async def callback(
+    request: Request,
+    code: Optional[str] = None,
+    error: Optional[str] = None,
+    repo=Depends(get_repository),
+):
     # Handle OAuth errors
     if error:
         return RedirectResponse(f"{FRONTEND_URL}?error={error}")
@@ -48,6 +49,10 @@ async def callback(request: Request, code: Optional[str] = None, error: Optional
     if not code:
         return RedirectResponse(f"{FRONTEND_URL}?error=no_code")
     
+    # imported here so app startup does not pay for them
+    import requests
+    from jose import jwt
+
     try:
         data = {
             "grant_type": "authorization_code",
@@ -57,28 +62,28 @@ async def callback(request: Request, code: Optional[str] = None, error: Optional
             "client_secret": CLIENT_SECRET,
         }
 
-        r = requests.post(TOKEN_URL, data=data, timeout=10)
-        token_data = r.json()
+        with tracing.span("idp.token_exchange") as span:
+            r = requests.post(TOKEN_URL, data=data, timeout=10)
+            token_data = r.json()
+            span.set(status=r.status_code)
 
         if "id_token" not in token_data:
+            logger.warning("Token exchange returned no id_token (status %s)", r.status_code)
             return RedirectResponse(f"{FRONTEND_URL}?error=token_exchange_failed")
 
-        claims = jwt.get_unverified_claims(token_data["id_token"])
+        with tracing.span("jwt.claims"):
+            claims = jwt.get_unverified_claims(token_data["id_token"])
         w3_id = claims.get("uid") or claims.get("preferred_username")
 
         if not w3_id:
             return RedirectResponse(f"{FRONTEND_URL}?error=invalid_claims")
 
         # ---- UPSERT EMPLOYEE ----
-        from datetime import datetime
-        employee = await employees_collection.find_one({"w3_id": w3_id})
-        if not employee:
-            await employees_collection.insert_one(employee_document(claims))
-        else:
-            await employees_collection.update_one(
-                {"w3_id": w3_id},
-                {"$set": {"last_login_at": datetime.utcnow()}},
-            )
+        await repo.login_employee(w3_id, claims)
+        cache.employee_cache.wrote(w3_id)
+        get_bus().publish("employees", w3_id)
+
+        logger.debug("Signed in", extra={"w3_id": w3_id})
 
         # ---- SESSION ----
         request.session["user"] = {
@@ -89,13 +94,15 @@ async def callback(request: Request, code: Optional[str] = None, error: Optional
 
         return RedirectResponse(FRONTEND_URL)
     
-    except Exception as e:
-        print(f"Callback error: {str(e)}")
+    except Exception:
+        logger.exception("Callback error")
         return RedirectResponse(f"{FRONTEND_URL}?error=auth_failed")
 
 # ---------------- DEPENDENCY ----------------
-def get_current_user(request: Request):
-    user = request.session.get("user")
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    return user
+# async so FastAPI runs it on the loop instead of a threadpool hop
+async def get_current_user(request: Request):
+    with tracing.span("auth.get_current_user"):
+        user = request.session.get("user")
+        if not user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        return user
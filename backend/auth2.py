@@ -3,13 +3,15 @@ from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt
 import requests
+import asyncio
 import os
 import logging
 from typing import Optional
 from pydantic import BaseModel
+from singleflight import SingleFlight
+import tracing
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Handlers and level come from log_config (LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # Initialize router and security
@@ -35,31 +37,39 @@ try:
     ISSUER = get_required_env_var("JWT_ISSUER")
     FRONTEND_URL = get_required_env_var("FRONTEND_URL")
 except ValueError as e:
-    logger.error(f"Configuration error: {e}")
+    logger.error("Configuration error: %s", e)
     raise
 
 # Cache for JWKS
 _jwks_cache = None
+_jwks_fetch = SingleFlight()
 
-def get_jwks():
-    """Retrieve JWKS from the endpoint with caching."""
+def _fetch_jwks():
+    res = requests.get(JWKS_URL, timeout=5)
+    res.raise_for_status()
+    return res.json()
+
+async def get_jwks():
+    """Retrieve JWKS from the endpoint with caching.
+
+    Concurrent cache misses share one fetch, run off the event loop."""
     global _jwks_cache
     if _jwks_cache:
         return _jwks_cache
     try:
-        logger.debug(f"Fetching JWKS from {JWKS_URL}")
-        res = requests.get(JWKS_URL, timeout=5)
-        res.raise_for_status()
-        _jwks_cache = res.json()
+        logger.debug("Fetching JWKS from %s", JWKS_URL)
+        _jwks_cache = await _jwks_fetch.do(
+            JWKS_URL, lambda: asyncio.to_thread(_fetch_jwks)
+        )
         return _jwks_cache
     except requests.RequestException as e:
-        logger.error(f"Failed to fetch JWKS: {str(e)}")
+        logger.error("Failed to fetch JWKS: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Failed to fetch JWKS: {str(e)}"
         )
 
-def verify_token(token: str):
+async def verify_token(token: str):
     """Verify JWT token and return its payload."""
     try:
         logger.debug("Verifying token...")
@@ -73,7 +83,8 @@ def verify_token(token: str):
                 detail="Token header missing key ID"
             )
 
-        jwks = get_jwks()
+        with tracing.span("jwt.jwks"):
+            jwks = await get_jwks()
         key = next((k for k in jwks.get("keys", []) if k.get("kid") == kid), None)
         
         if not key:
@@ -83,18 +94,19 @@ def verify_token(token: str):
                 detail="Invalid token key"
             )
 
-        payload = jwt.decode(
-            token,
-            key,
-            algorithms=["RS256"],
-            issuer=ISSUER,
-            options={"verify_aud": False},
-        )
+        with tracing.span("jwt.decode"):
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                issuer=ISSUER,
+                options={"verify_aud": False},
+            )
         logger.debug("Token verified successfully")
         return payload
 
     except jwt.JWTError as e:
-        logger.error(f"JWT Error: {str(e)}")
+        logger.error("JWT Error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid token: {str(e)}"
@@ -106,7 +118,7 @@ async def get_current_user(
     """Dependency to get current user from JWT token."""
     try:
         token = credentials.credentials
-        payload = verify_token(token)
+        payload = await verify_token(token)
         
         return {
             "w3_id": payload.get("uid") or payload.get("sub"),
@@ -115,10 +127,10 @@ async def get_current_user(
         }
         
     except HTTPException as e:
-        logger.error(f"Authentication error: {str(e.detail)}")
+        logger.error("Authentication error: %s", e.detail)
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in get_current_user: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in get_current_user: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing authentication: {str(e)}"
@@ -176,13 +188,13 @@ async def auth_w3id(code: str = None):
         return response
 
     except requests.RequestException as e:
-        logger.error(f"Token exchange failed: {str(e)}")
+        logger.error("Token exchange failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Authentication service unavailable"
         )
     except Exception as e:
-        logger.error(f"Unexpected error in auth_w3id: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in auth_w3id: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error during authentication"
@@ -206,10 +218,10 @@ async def login():
             f"&redirect_uri={redirect_uri}"
             "&scope=openid%20profile%20email"
         )
-        logger.debug(f"Redirecting to login URL: {url}")
+        logger.debug("Redirecting to login URL: %s", url)
         return RedirectResponse(url=url)
     except Exception as e:
-        logger.error(f"Login error: {str(e)}", exc_info=True)
+        logger.error("Login error: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error initiating login: {str(e)}"
@@ -0,0 +1,137 @@
+# Book/release under contention: the optimistic path in main.py (versioned
+# compare-and-swap, see concurrency.py) against the multi-document
+# transactions in main2.py. Many users fight over a few seats; each books a
+# random one and releases it again whenever it wins.
+#
+# Transactions need a replica set, so --path txn/both does too. --path cas
+# runs on the in-memory storage engine (--latency-ms per operation stands in
+# for round trips), or with --storage mongo against any mongod. Each Mongo
+# run gets its own throwaway database.
+# Run from backend/: python -m benchmarks.contention [--users 50] [--seats 5] [--rounds 20] [--path both]
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import concurrency
+import database
+import main2
+import repository
+from auth import get_current_user
+from benchmarks.replay import USER_HEADER, check_invariants, replay_user
+from loop_monitor import QUANTILES, percentile
+from main import app, seed
+
+
+async def hammer(target, users: int, seats: int, rounds: int, rng_seed: int) -> dict:
+    rng = random.Random(rng_seed)
+    statuses = Counter()
+    latencies = []
+    transport = httpx.ASGITransport(app=target, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def user(n):
+            w3_id = f"user{n}"
+            for _ in range(rounds):
+                seat_id = rng.randint(1, seats)
+                body = {"seat_id": seat_id, "name": w3_id, "date": "Today", "time_slot": "9:00 AM"}
+                started = time.perf_counter()
+                response = await client.post("/book", json=body, headers={USER_HEADER: w3_id})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    await client.post(f"/release/{seat_id}", headers={USER_HEADER: w3_id})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(n) for n in range(users)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "bookings": statuses[200],
+        "bookings_per_s": round(statuses[200] / elapsed, 1),
+        **{f"book_p{round(q * 100)}_ms": round(percentile(ordered, q) * 1000, 2) for q in QUANTILES},
+        "book_max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+async def run_cas(args) -> dict:
+    if args.storage == "mongo":
+        database.MONGO_URL = args.mongo_url or database.MONGO_URL
+        database.MONGO_DB_NAME = "contention_cas"
+        await database.connect().drop_database("contention_cas")
+    repo = repository.create_repository(args.storage)
+    if args.storage == "memory":
+        repo.latency = args.latency_ms / 1000
+    await seed(repo)
+    await repo.ensure_indexes()
+    app.dependency_overrides.setdefault(get_current_user, replay_user)
+    before = dict(concurrency.stats)
+    try:
+        report = await hammer(app, args.users, args.seats, args.rounds, args.seed)
+        seats = await repo.list_seats()
+        employees = await repo.list_employees()
+    finally:
+        if args.storage == "mongo":
+            await database.get_client().drop_database("contention_cas")
+            database.close()
+    report["cas"] = {k: v - before.get(k, 0) for k, v in concurrency.stats.items()}
+    report["violations"] = check_invariants(seats, employees, [])
+    return report
+
+
+async def run_txn(args) -> dict:
+    client = AsyncIOMotorClient(args.mongo_url or database.MONGO_URL)
+    main2.client = client
+    main2.db = client["contention_txn"]
+    main2.seats_collection = main2.db.seats
+    main2.employees_collection = main2.db.employees
+    await client.drop_database("contention_txn")
+    await main2.seats_collection.insert_many([{"_id": i, "status": "available", "price": 5} for i in range(1, 101)])
+    await main2.employees_collection.create_index("w3_id", unique=True)
+    main2.app.dependency_overrides.setdefault(get_current_user, replay_user)
+    try:
+        report = await hammer(main2.app, args.users, args.seats, args.rounds, args.seed)
+        seats = await main2.seats_collection.find().to_list(None)
+        employees = await main2.employees_collection.find().to_list(None)
+    finally:
+        await client.drop_database("contention_txn")
+        client.close()
+    # main2 keeps no token balance; 5xx here are aborted transactions
+    report["violations"] = check_invariants(seats, employees, [], check_tokens=False)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seats", type=int, default=5, help="how many seats the users fight over")
+    parser.add_argument("--rounds", type=int, default=20, help="booking attempts per user")
+    parser.add_argument("--path", choices=("cas", "txn", "both"), default="both")
+    parser.add_argument("--storage", choices=("memory", "mongo"), default="memory", help="for --path cas")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="per operation, with --storage memory")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    report = {}
+    if args.path in ("cas", "both"):
+        report["cas"] = asyncio.run(run_cas(args))
+    if args.path in ("txn", "both"):
+        report["txn"] = asyncio.run(run_txn(args))
+    print(json.dumps(report, indent=2))
+    if any(r["violations"] for r in report.values()):
+        print("FAIL: invariant violations", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
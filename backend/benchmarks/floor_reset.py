@@ -0,0 +1,52 @@
+# Time an admin floor reset: N occupied seats (and their holders) released
+# through admin.release_matching, on the in-memory storage engine or, with
+# --storage mongo, in a throwaway database.
+# Run from backend/: python -m benchmarks.floor_reset [--seats 10000] [--batch-size 1000] [--storage memory]
+import argparse
+import asyncio
+import json
+import time
+
+import admin
+import database
+import repository
+from schemas import SEAT_COST
+
+DB_NAME = "floor_reset_bench"
+
+
+async def run(seats: int, batch_size: int, storage: str = "memory") -> dict:
+    if storage == "mongo":
+        database.MONGO_DB_NAME = DB_NAME
+        await database.connect().drop_database(DB_NAME)
+    repo = repository.create_repository(storage)
+    try:
+        await repo.seed_seats(
+            [{"_id": i, "status": "occupied", "booked_by": f"user{i}", "floor": 1, "price": 5, "version": 1}
+             for i in range(1, seats + 1)]
+        )
+        for i in range(1, seats + 1):
+            await repo.record_booking(None, f"user{i}", i, SEAT_COST, None)
+        started = time.perf_counter()
+        totals = await admin.release_matching(repo, {"floor": 1}, batch_size)
+        totals["elapsed_s"] = round(time.perf_counter() - started, 3)
+        totals["left_occupied"] = await repo.count_seats("occupied")
+        totals["left_unrefunded"] = sum(1 for e in await repo.list_employees() if e.get("blue_tokens_spent"))
+        return totals
+    finally:
+        if storage == "mongo":
+            await database.get_client().drop_database(DB_NAME)
+            database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seats", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=admin.ADMIN_BATCH_SIZE)
+    parser.add_argument("--storage", choices=("memory", "mongo"), default="memory")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.seats, args.batch_size, args.storage)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Drives the app in-process and reports event-loop lag next to route
+# latencies. Exits non-zero when any single callback holds the loop longer
+# than --block-ms (or lag p99 exceeds --lag-budget-ms, if given), so a new
+# blocking call fails the benchmark run before it ships. Only the timed run
+# counts: one warm-up pass over every route (first renders, lazy imports)
+# happens before the monitor starts.
+# Run from backend/: python -m benchmarks.loop_lag [--requests N] [--block-ms MS]
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+import httpx
+
+import metrics
+import seat_mirror
+from auth import get_current_user
+from repository import get_read_repository
+from loop_monitor import LoopLagMonitor
+from main import app, seed_document
+from seat_table import SeatTable
+
+ROUTES = ("/seats", "/seats?shape=columnar", "/seats/summary", "/seats/recommend?x=2&y=2&floor=1", "/healthz")
+
+
+async def bench_user():
+    return {"w3_id": "bench"}
+
+
+async def no_repository():
+    return None
+
+
+async def drive(total: int, concurrency: int, monitor: LoopLagMonitor):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def get(path):
+            response = await client.get(path, headers={"Accept-Encoding": "gzip"})
+            response.raise_for_status()
+
+        for path in ROUTES:
+            await get(path)
+
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(ROUTES[i % len(ROUTES)])
+
+        async def worker():
+            while not queue.empty():
+                await get(queue.get_nowait())
+                # In-process requests never wait on I/O, so without this a
+                # worker would run its whole share in one loop callback.
+                await asyncio.sleep(0)
+
+        metrics.reset()
+        await monitor.start()
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await monitor.stop()
+
+
+def run(requests: int = 5000, concurrency: int = 10, seats: int = 2000, block_ms: float = 50.0):
+    """Returns the metrics snapshot and the monitor that produced it."""
+    # Seat reads come from an in-memory mirror; no Mongo needed.
+    mirror = seat_mirror.SeatMirror(collection=None, table=SeatTable())
+    mirror.table.load([seed_document(i) for i in range(1, seats + 1)])
+    mirror.ready, mirror.synced_at = True, datetime.utcnow()
+    previous_mirror, previous_monitor = seat_mirror._mirror, metrics.monitor
+    seat_mirror._mirror = mirror
+    app.dependency_overrides[get_current_user] = bench_user
+    app.dependency_overrides[get_read_repository] = no_repository
+
+    monitor = LoopLagMonitor(interval=0.005, debug=True, block_threshold=block_ms / 1000)
+    metrics.monitor = monitor
+    try:
+        asyncio.run(drive(requests, concurrency, monitor))
+        return metrics.snapshot(), monitor
+    finally:
+        seat_mirror._mirror, metrics.monitor = previous_mirror, previous_monitor
+        app.dependency_overrides.pop(get_current_user, None)
+        app.dependency_overrides.pop(get_read_repository, None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seats", type=int, default=2000)
+    parser.add_argument("--block-ms", type=float, default=50.0)
+    parser.add_argument("--lag-budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    report, monitor = run(args.requests, args.concurrency, args.seats, args.block_ms)
+    print(json.dumps(report, indent=2))
+    lag_p99 = report["event_loop_lag_ms"]["p99"]
+    over_budget = args.lag_budget_ms is not None and lag_p99 > args.lag_budget_ms
+    if over_budget or report["event_loop_blocked"]:
+        print(f"FAIL: event loop lag p99 {lag_p99:.1f} ms, "
+              f"{report['event_loop_blocked']} callbacks held the loop over {args.block_ms} ms",
+              file=sys.stderr)
+        for episode in monitor.blocked:
+            print(episode["stack"], file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Nearest-free-seat search on a large inventory.
+# Run from backend/: python -m benchmarks.recommend
+import random
+import time
+
+from seat_table import SeatTable
+
+SEATS = 20_000
+QUERIES = 2_000
+K = 5
+
+
+def main():
+    rng = random.Random(1)
+    table = SeatTable()
+    table.load([
+        {
+            "_id": i,
+            "status": "occupied" if rng.random() < 0.7 else "available",
+            "floor": i % 10 + 1,
+            "x": float(rng.randint(0, 60)),
+            "y": float(rng.randint(0, 40)),
+            "zone": "AB"[i % 2],
+        }
+        for i in range(1, SEATS + 1)
+    ])
+
+    timings = []
+    for _ in range(QUERIES):
+        x, y, floor = rng.uniform(0, 60), rng.uniform(0, 40), rng.randint(1, 10)
+        start = time.perf_counter()
+        table.nearest_available(x, y, K, floor=floor)
+        timings.append(time.perf_counter() - start)
+        # book/release churn between queries keeps the index incremental
+        seat_id = rng.randint(1, SEATS)
+        table.update(seat_id, status=rng.choice(("available", "occupied")))
+
+    timings.sort()
+    print(f"seats={SEATS} k={K} queries={QUERIES}")
+    for pct in (50, 95, 99):
+        print(f"p{pct}: {timings[int(len(timings) * pct / 100) - 1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Replays captured traffic (see capture.py) against the app in-process, at
+# the captured pace or faster, then checks the booking invariants on what
+# is left in the database. Exits non-zero on any violation.
+#
+# Runs on the in-memory storage engine by default; --storage mongo uses a
+# local mongod (--mongo-url, default MONGO_URL) in a throwaway database.
+#
+# Run from backend/:
+#   python -m benchmarks.replay CAPTURE.jsonl [--speed 10]
+#   python -m benchmarks.replay --synthesize 5000 [--speed 100]
+#   python -m benchmarks.replay --synthesize 5000 --out capture.jsonl
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import List
+
+import httpx
+from fastapi import HTTPException, Request
+
+import capture
+import database
+import repository
+from auth import get_current_user
+from loop_monitor import QUANTILES, percentile
+from main import SEAT_COST, app, seed
+
+USER_HEADER = "X-Replay-User"
+SEEDED_SEATS = 100
+
+
+async def replay_user(request: Request):
+    """Stands in for the session: the captured user rides in a header."""
+    w3_id = request.headers.get(USER_HEADER)
+    if not w3_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return {"w3_id": w3_id, "email": None, "name": w3_id}
+
+
+def synthesize(total: int, users: int = 200, seats: int = SEEDED_SEATS, rps: float = 50.0, seed: int = 1) -> List[dict]:
+    """A capture shaped like booking traffic: mostly seat-map polling, with
+    bookings piling onto a few popular seats so that they collide."""
+    rng = random.Random(seed)
+    popular = max(1, seats // 10)
+    holding = {}
+    entries = []
+    t = 0.0
+
+    def add(method, path, route, user, body=None):
+        entries.append({"t": round(t, 4), "method": method, "path": path, "json": body, "user": user, "route": route})
+
+    while len(entries) < total:
+        t += rng.expovariate(rps)
+        user = f"user{rng.randrange(users)}"
+        roll = rng.random()
+        if user in holding and roll < 0.3:
+            add("POST", f"/release/{holding.pop(user)}", "/release/{seat_id}", user)
+        elif roll < 0.55:
+            seat_id = rng.randint(1, popular) if rng.random() < 0.6 else rng.randint(1, seats)
+            add("POST", "/book", "/book", user, {"seat_id": seat_id, "date": "Today", "time_slot": "9:00 AM"})
+            holding.setdefault(user, seat_id)
+        elif roll < 0.85:
+            add("GET", "/seats", "/seats", user)
+        elif roll < 0.95:
+            add("GET", "/seats/summary", "/seats/summary", user)
+        else:
+            add("GET", "/me", "/me", user)
+    return entries
+
+
+async def replay(entries: List[dict], speed: float):
+    """Open loop: each request goes out at its captured time / speed,
+    whether or not earlier ones have finished."""
+    results = []
+    lags = []
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+
+        async def send(entry):
+            headers = {USER_HEADER: entry["user"]} if entry.get("user") else {}
+            started = time.perf_counter()
+            response = await client.request(entry["method"], entry["path"], json=entry.get("json"), headers=headers)
+            key = f'{entry["method"]} {entry.get("route") or entry["path"]}'
+            results.append((key, response.status_code, time.perf_counter() - started))
+
+        loop = asyncio.get_running_loop()
+        origin = entries[0]["t"] if entries else 0.0
+        start = loop.time()
+        tasks = []
+        for entry in entries:
+            due = start + (entry["t"] - origin) / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, loop.time() - due))
+            tasks.append(asyncio.create_task(send(entry)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+    return results, lags, elapsed
+
+
+def check_invariants(seats: List[dict], employees: List[dict], results, check_tokens: bool = True) -> List[str]:
+    violations = []
+    holders = defaultdict(list)
+    for employee in employees:
+        w3_id = employee["w3_id"]
+        held = employee.get("booked_seats") or []
+        for seat_id in held:
+            holders[seat_id].append(w3_id)
+        if len(held) > 1:
+            violations.append(f"{w3_id} holds {len(held)} seats: {held}")
+        spent = employee.get("blue_tokens_spent", 0)
+        if check_tokens and spent != SEAT_COST * len(held):
+            violations.append(f"{w3_id} spent {spent} tokens while holding {len(held)} seats")
+
+    booked_by = {seat["_id"]: seat.get("booked_by") for seat in seats if seat.get("status") == "occupied"}
+    for seat_id, w3_ids in sorted(holders.items()):
+        if len(w3_ids) > 1:
+            violations.append(f"seat {seat_id} double-booked by {w3_ids}")
+        elif booked_by.get(seat_id) != w3_ids[0]:
+            violations.append(f"{w3_ids[0]} lists seat {seat_id} but the seat is booked by {booked_by.get(seat_id)}")
+    for seat_id, w3_id in sorted(booked_by.items()):
+        if w3_id not in holders.get(seat_id, ()):
+            violations.append(f"seat {seat_id} occupied by {w3_id} without a matching employee record")
+
+    server_errors = sum(1 for _, status, _ in results if status >= 500)
+    if server_errors:
+        violations.append(f"{server_errors} responses were 5xx")
+    return violations
+
+
+def summarize(results, lags, elapsed, speed) -> dict:
+    by_route = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for key, status, seconds in results:
+        by_route[key].append(seconds)
+        statuses[key][status] += 1
+
+    def ms(samples):
+        ordered = sorted(samples)
+        summary = {f"p{round(q * 100)}_ms": round(percentile(ordered, q) * 1000, 2) for q in QUANTILES}
+        summary["max_ms"] = round(ordered[-1] * 1000, 2) if ordered else 0.0
+        return summary
+
+    return {
+        "requests": len(results),
+        "speed": speed,
+        "elapsed_s": round(elapsed, 3),
+        "achieved_rps": round(len(results) / elapsed, 1) if elapsed else None,
+        "schedule_lag": ms(lags),
+        "routes": {
+            key: {"count": len(samples), **ms(samples), "status": dict(sorted(statuses[key].items()))}
+            for key, samples in sorted(by_route.items())
+        },
+    }
+
+
+async def run(entries: List[dict], speed: float, storage: str = "memory", mongo_url: str = None, db_name: str = "replay") -> dict:
+    if storage == "mongo":
+        database.MONGO_URL = mongo_url or database.MONGO_URL
+        database.MONGO_DB_NAME = db_name
+        await database.connect().drop_database(db_name)
+    repo = repository.create_repository(storage)
+    await seed(repo)
+    app.dependency_overrides.setdefault(get_current_user, replay_user)
+    try:
+        results, lags, elapsed = await replay(entries, speed)
+        seats = await repo.list_seats()
+        employees = await repo.list_employees()
+    finally:
+        if storage == "mongo":
+            await database.get_client().drop_database(db_name)
+            database.close()
+    report = summarize(results, lags, elapsed, speed)
+    report["violations"] = check_invariants(seats, employees, results)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", nargs="?", help="capture file written with CAPTURE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 replays at the captured pace, 10 or 100 compress it")
+    parser.add_argument("--synthesize", type=int, default=0, metavar="N", help="generate N requests instead of reading a capture")
+    parser.add_argument("--out", help="with --synthesize: write the capture here and exit")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rps", type=float, default=50.0, help="synthesized request rate at 1x")
+    parser.add_argument("--storage", choices=("memory", "mongo"), default="memory")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db", default="replay")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        entries = synthesize(args.synthesize, users=args.users, rps=args.rps)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            return
+    elif args.capture:
+        entries = capture.load(args.capture)
+    else:
+        parser.error("give a capture file or --synthesize N")
+
+    report = asyncio.run(run(entries, args.speed, args.storage, args.mongo_url, args.db))
+    print(json.dumps(report, indent=2))
+    if report["violations"]:
+        print(f"FAIL: {len(report['violations'])} invariant violations", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Import and boot time of the API.
+# Run from backend/: python -m benchmarks.startup [--runs N]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each run is a fresh interpreter so nothing is already imported.
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+BOOT_SNIPPET = """
+import asyncio, time
+t = time.perf_counter()
+import main, health
+imported = time.perf_counter()
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        started = time.perf_counter()
+        deadline = started + {ready_timeout}
+        while not health.is_ready() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        ready = time.perf_counter() if health.is_ready() else None
+        return started, ready
+
+started, ready = asyncio.run(boot())
+print(imported - t, started - t, (ready - t) if ready else -1)
+"""
+
+
+def run(snippet):
+    out = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [float(v) for v in out.stdout.split()]
+
+
+def report(name, samples):
+    samples = [s for s in samples if s >= 0]
+    if not samples:
+        print(f"{name:<12} n/a")
+        return
+    print(
+        f"{name:<12} median {statistics.median(samples) * 1000:8.1f} ms"
+        f"   min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    imports = [run(IMPORT_SNIPPET)[0] for _ in range(args.runs)]
+    boots = [run(BOOT_SNIPPET.format(ready_timeout=args.ready_timeout)) for _ in range(args.runs)]
+
+    report("import", imports)
+    report("serving", [b[1] for b in boots])
+    report("ready", [b[2] for b in boots])
+    if any(b[2] < 0 for b in boots):
+        print("(not ready within timeout: is MONGO_URL reachable?)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# cache.py
+# Small per-process read caches. Entries expire after a TTL and are dropped
+# early when the invalidation bus reports a write from any worker.
+import os
+import time
+
+from invalidation import InvalidationBus
+
+# ENV
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "2"))
+
+MISSING = object()
+
+
+class LocalCache:
+    """Key/value cache that never stores a value loaded before the most
+    recent invalidation.
+
+    Every invalidation bumps ``generation``. Loaders read the generation
+    before querying Mongo and ``set`` refuses the value if it moved in the
+    meantime, so a slow read cannot overwrite a newer write with stale data.
+    """
+
+    def __init__(self, name: str, ttl: float = CACHE_TTL_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = {}
+        # keys this process wrote and has not reloaded since
+        self._written = set()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return MISSING
+        return value
+
+    def set(self, key, value, generation: int):
+        if generation != self.generation:
+            return False
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._written.discard(key)
+        return True
+
+    def wrote(self, key):
+        """Note a write to ``key`` made by this process. Until a load of
+        ``key`` is cached, ``needs_primary`` is true: a secondary may not
+        have the write yet, and caching its answer would pin stale data
+        under the new generation."""
+        self._written.add(key)
+
+    def needs_primary(self, key) -> bool:
+        return key in self._written
+
+    def invalidate(self, key=None):
+        self.generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.generation
+        value = await loader()
+        self.set(key, value, generation)
+        return value
+
+
+# CACHES
+SEAT_LIST = "all"
+# every seat as a SeatTable, for /seats/recommend when there is no mirror
+SEAT_TABLE = "table"
+
+seat_cache = LocalCache("seats")
+employee_cache = LocalCache("employees")
+
+_caches = {cache.name: cache for cache in (seat_cache, employee_cache)}
+
+
+def on_invalidate(topic: str, key=None):
+    cache = _caches.get(topic)
+    if cache is None:
+        return
+    if topic == "seats":
+        # The seat list and table hold every seat; any seat change invalidates them.
+        cache.invalidate()
+    else:
+        cache.invalidate(key)
+
+
+def install(bus: InvalidationBus):
+    bus.subscribe(on_invalidate)
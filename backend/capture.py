@@ -0,0 +1,153 @@
+# capture.py
+# Records live traffic for offline replay (benchmarks/replay.py).
+#
+# With CAPTURE_FILE set, every API request is appended to that file as one
+# JSON line:
+#
+#   {"t": 12.031, "method": "POST", "path": "/book", "json": {"seat_id": 4, ...},
+#    "user": "3f1c9a0b2e4d", "route": "/book", "status": 200, "ms": 8.4}
+#
+# ``t`` is seconds since capture started, ``user`` a stable hash of the
+# signed-in w3 id, ``route`` the matched route template. Captures never hold
+# real ids: query parameters and body fields named in USER_FIELDS are hashed
+# the same way, so a replayed ``?teammates=`` still points at replayed users.
+# Sign-in traffic (codes, state) and probe and metrics traffic are left out.
+import hashlib
+import json
+import os
+import time
+from typing import Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from tracing import JsonFileExporter
+
+# ENV
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+
+MAX_BODY_BYTES = 16 * 1024
+SKIP_PATHS = ("/healthz", "/readyz", "/metrics")
+SKIP_PREFIXES = ("/auth/",)
+# query parameters and JSON fields holding w3 ids (comma-separated in queries)
+USER_FIELDS = {"w3_id", "teammates", "booked_by", "email"}
+
+_writer: Optional[JsonFileExporter] = None
+_started = 0.0
+
+
+def start(path: Optional[str] = CAPTURE_FILE):
+    global _writer, _started
+    stop()
+    if path:
+        _writer = JsonFileExporter(path)
+        _started = time.monotonic()
+
+
+def stop():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def anonymize(w3_id: Optional[str]) -> Optional[str]:
+    if not w3_id:
+        return None
+    return hashlib.sha256(w3_id.encode()).hexdigest()[:12]
+
+
+def anonymize_query(query: str) -> str:
+    return urlencode(
+        [
+            (name, ",".join(anonymize(v) or "" for v in value.split(",")) if name in USER_FIELDS else value)
+            for name, value in parse_qsl(query, keep_blank_values=True)
+        ],
+        safe=",",
+    )
+
+
+def anonymize_json(value):
+    """``value`` with every string under a USER_FIELDS key hashed."""
+    if isinstance(value, list):
+        return [anonymize_json(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: _anonymize_field(item) if key in USER_FIELDS else anonymize_json(item)
+        for key, item in value.items()
+    }
+
+
+def _anonymize_field(value):
+    if isinstance(value, str):
+        return anonymize(value)
+    if isinstance(value, list):
+        return [_anonymize_field(item) for item in value]
+    return anonymize_json(value)
+
+
+def _skipped(path: str) -> bool:
+    return path in SKIP_PATHS or path.startswith(SKIP_PREFIXES)
+
+
+def load(path: str) -> List[dict]:
+    """A capture file as a list of entries ordered by ``t``."""
+    return sorted(read(path), key=lambda entry: entry["t"])
+
+
+def read(path: str) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CaptureMiddleware:
+    """Appends each request to the capture file. Sits inside SessionMiddleware
+    so the signed-in user is known."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _writer is None or scope["type"] != "http" or _skipped(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        t = time.monotonic() - _started
+        started = time.perf_counter()
+        body = bytearray()
+        status = 500
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) < MAX_BODY_BYTES:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_keep, send_wrapper)
+        finally:
+            path = scope["path"]
+            if scope.get("query_string"):
+                path += "?" + anonymize_query(scope["query_string"].decode("latin-1"))
+            try:
+                payload = anonymize_json(json.loads(body)) if body else None
+            except ValueError:
+                payload = None
+            user = (scope.get("session") or {}).get("user") or {}
+            route = scope.get("route")
+            _writer.export([{
+                "t": round(t, 4),
+                "method": scope["method"],
+                "path": path,
+                "json": payload,
+                "user": anonymize(user.get("w3_id")),
+                "route": route.path if route is not None else None,
+                "status": status,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+            }])
@@ -0,0 +1,82 @@
+# compression.py
+# Content-Encoding negotiation and a per-version cache of encoded payloads.
+import gzip
+import os
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# ENV
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best encoding the client accepts, preferring br over gzip."""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in supported_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class SnapshotCache:
+    """Encoded payloads for the current version of a snapshot.
+
+    Each (variant, encoding) pair is compressed at most once per version;
+    when the version moves on, every cached payload is dropped.
+    """
+
+    def __init__(self, min_bytes: int = COMPRESSION_MIN_BYTES):
+        self.min_bytes = min_bytes
+        self.version = None
+        self._bodies: Dict[Tuple[str, Optional[str]], bytes] = {}
+
+    def get(self, version, variant: str, accept_encoding: Optional[str], render) -> Tuple[bytes, Optional[str]]:
+        """Return (body, content_encoding) for ``variant`` at ``version``.
+
+        ``render`` builds the uncompressed body and is only called when the
+        identity payload for this version is not cached yet.
+        """
+        if version != self.version:
+            self.version = version
+            self._bodies = {}
+        raw = self._bodies.get((variant, None))
+        if raw is None:
+            raw = self._bodies[(variant, None)] = render()
+        encoding = negotiate(accept_encoding)
+        if encoding is None or len(raw) < self.min_bytes:
+            return raw, None
+        body = self._bodies.get((variant, encoding))
+        if body is None:
+            body = self._bodies[(variant, encoding)] = compress(raw, encoding)
+        return body, encoding
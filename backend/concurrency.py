@@ -0,0 +1,90 @@
+# concurrency.py
+# Optimistic concurrency for seat and employee documents.
+#
+# Both carry a ``version`` that every write to their booking state bumps. A
+# write names the version it read (compare-and-swap); if another writer got
+# there first nothing matches, Conflict is raised and the whole operation
+# re-reads and tries again after a short random delay. No transaction, and
+# so no replica set, is needed, and nothing is held while a request waits.
+import asyncio
+import logging
+import os
+import random
+from collections import Counter
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# ENV
+CAS_MAX_ATTEMPTS = int(os.getenv("CAS_MAX_ATTEMPTS", "5"))
+CAS_BASE_DELAY_MS = float(os.getenv("CAS_BASE_DELAY_MS", "5"))
+
+# attempts, conflicts, exhausted; exported on /metrics
+stats = Counter()
+
+
+class Conflict(Exception):
+    """A compare-and-swap lost to a concurrent writer."""
+
+
+class IndexMissing(Exception):
+    """The unique index CAS upserts rely on could not be created."""
+
+
+def version_filter(doc) -> dict:
+    """Matches ``doc`` only while it still has the version it was read with.
+    Documents written before versions existed have no field at all."""
+    if doc is not None and "version" in doc:
+        return {"version": doc["version"]}
+    return {"version": {"$exists": False}}
+
+
+def with_version(update: dict) -> dict:
+    return {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+
+
+def next_version(doc) -> int:
+    return (doc or {}).get("version", 0) + 1
+
+
+async def cas_update(collection, query: dict, doc, update: dict, **kwargs):
+    """update_one on ``query``, pinned to the version ``doc`` was read at.
+    Raises Conflict when the document moved on in the meantime."""
+    try:
+        result = await collection.update_one({**query, **version_filter(doc)}, with_version(update), **kwargs)
+    except DuplicateKeyError:
+        # an upsert raced another upsert of the same document
+        raise Conflict() from None
+    if result.matched_count == 0 and result.upserted_id is None:
+        raise Conflict()
+    return result
+
+
+async def retry(operation, attempts: int = CAS_MAX_ATTEMPTS, base_delay: float = CAS_BASE_DELAY_MS / 1000):
+    """Await ``operation()`` until it stops raising Conflict.
+
+    Between attempts it sleeps a random share of an exponentially growing
+    delay ("full jitter"), so writers that collided spread out instead of
+    colliding again. The last Conflict propagates.
+    """
+    for attempt in range(attempts):
+        stats["attempts"] += 1
+        try:
+            return await operation()
+        except Conflict:
+            stats["conflicts"] += 1
+            if attempt == attempts - 1:
+                stats["exhausted"] += 1
+                raise
+            await asyncio.sleep(random.uniform(0, base_delay * 2 ** attempt))
+
+
+async def ensure_indexes(employees_collection):
+    """One document per w3 id, so racing upserts conflict instead of
+    duplicating. Bookings are not safe without it, so failing to create it
+    raises IndexMissing and the caller keeps the worker out of rotation."""
+    try:
+        await employees_collection.create_index("w3_id", unique=True)
+    except OperationFailure as e:
+        raise IndexMissing(f"Unique w3_id index not created ({e}); are there duplicate employees?") from e
@@ -0,0 +1,197 @@
+# database.py
+import os
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring, ReadPreference
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# ENV
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "office_booking_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+# Where read-only routes (seat map polling) read from; writes always use
+# the primary.
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+# With a non-primary preference, secondaries may serve reads at most this
+# many seconds behind the primary. MongoDB requires >= 90; -1 means no bound.
+MONGO_READ_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_READ_MAX_STALENESS_SECONDS", "90"))
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def check_read_settings(preference: str, max_staleness: int):
+    """Fail at startup rather than on the first replica read."""
+    if preference not in READ_PREFERENCES:
+        raise ValueError(f"MONGO_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}, not {preference!r}")
+    if max_staleness != -1 and max_staleness < 90:
+        raise ValueError(f"MONGO_READ_MAX_STALENESS_SECONDS must be -1 or at least 90, not {max_staleness}")
+
+
+check_read_settings(MONGO_READ_PREFERENCE, MONGO_READ_MAX_STALENESS_SECONDS)
+
+
+# POOL STATS
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so they can be reported without
+    reaching into driver internals."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkout_failed = 0
+        self.wait_queue_timeouts = 0
+        self.pools_cleared = 0
+
+    @property
+    def open(self):
+        return self.created - self.closed
+
+    @property
+    def in_use(self):
+        return self.checked_out
+
+    def as_dict(self):
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "created": self.created,
+            "closed": self.closed,
+            "checkout_failed": self.checkout_failed,
+            "wait_queue_timeouts": self.wait_queue_timeouts,
+            "pools_cleared": self.pools_cleared,
+        }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failed += 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.wait_queue_timeouts += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+pool_stats = PoolStats()
+
+# CLIENT
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def pool_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+    }
+
+
+def connect() -> AsyncIOMotorClient:
+    """Create the process-wide client. Called once from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URL,
+            event_listeners=[pool_stats],
+            **pool_options(),
+        )
+    return _client
+
+
+def close():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        pool_stats.reset()
+
+
+def get_client() -> AsyncIOMotorClient:
+    return connect()
+
+
+def replica_reads_enabled():
+    return MONGO_READ_PREFERENCE != "primary"
+
+
+def read_preference():
+    if not replica_reads_enabled():
+        return ReadPreference.PRIMARY
+    return READ_PREFERENCES[MONGO_READ_PREFERENCE](max_staleness=MONGO_READ_MAX_STALENESS_SECONDS)
+
+
+def snapshot_headers():
+    """Headers telling clients how fresh a replica read can be."""
+    if not replica_reads_enabled():
+        return {"X-Read-Preference": "primary", "X-Snapshot-Max-Staleness": "0"}
+    return {
+        "X-Read-Preference": MONGO_READ_PREFERENCE,
+        "X-Snapshot-Max-Staleness": str(MONGO_READ_MAX_STALENESS_SECONDS),
+    }
+
+
+# DEPENDENCIES
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+# Writes and the conflict checks that guard them always go to the primary,
+# whatever MONGO_READ_PREFERENCE says.
+def get_seats_collection():
+    return get_db().get_collection("seats", read_preference=ReadPreference.PRIMARY)
+
+
+def get_employees_collection():
+    return get_db().get_collection("employees", read_preference=ReadPreference.PRIMARY)
+
+
+def get_reservations_collection():
+    return get_db().get_collection("reservations", read_preference=ReadPreference.PRIMARY)
+
+
+# Read-only routes (seat map polling) can scale out over replicas.
+def get_seats_read_collection():
+    return get_db().get_collection("seats", read_preference=read_preference())
+
+
+def get_employees_read_collection():
+    return get_db().get_collection("employees", read_preference=read_preference())
@@ -0,0 +1,85 @@
+# health.py
+# Liveness and readiness probes. Neither needs auth, and readiness answers
+# from cached state: Mongo is pinged at most once per PING_INTERVAL_SECONDS
+# however often the probes run.
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import repository
+from loop_monitor import monitor
+from singleflight import SingleFlight
+
+router = APIRouter(tags=["Health"])
+
+# ENV
+PING_INTERVAL_SECONDS = float(os.getenv("HEALTH_PING_INTERVAL_SECONDS", "5"))
+PING_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", "2"))
+READY_MAX_LOOP_LAG_MS = float(os.getenv("READY_MAX_LOOP_LAG_MS", "1000"))
+
+# Flipped by the app lifespan once background warm-up has finished.
+_ready = False
+_reason = "starting"
+
+_ping_flight = SingleFlight()
+_last_ping: Optional[dict] = None
+_last_ping_at = 0.0
+
+
+def mark_ready():
+    global _ready, _reason
+    _ready, _reason = True, None
+
+
+def mark_not_ready(reason: str):
+    global _ready, _reason
+    _ready, _reason = False, reason
+
+
+def is_ready():
+    return _ready
+
+
+async def _ping():
+    global _last_ping, _last_ping_at
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(repository.get_repository().ping(), PING_TIMEOUT_SECONDS)
+        result = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        result = {"ok": False, "error": type(e).__name__}
+    result["checked_at"] = datetime.utcnow().isoformat() + "Z"
+    _last_ping, _last_ping_at = result, time.monotonic()
+    return result
+
+
+async def check_database() -> dict:
+    if _last_ping is not None and time.monotonic() - _last_ping_at < PING_INTERVAL_SECONDS:
+        return _last_ping
+    return await _ping_flight.do("ping", _ping)
+
+
+@router.get("/healthz")
+async def healthz():
+    # liveness: the process is up and the event loop is answering
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    if not _ready:
+        return JSONResponse({"status": "not ready", "reason": _reason}, status_code=503)
+
+    # status only: pool and latency details are for signed-in users
+    # (/db/pool) and /metrics, not for anyone who can reach the probe
+    db = await check_database()
+    if not db["ok"]:
+        return JSONResponse({"status": "not ready", "reason": "database unreachable"}, status_code=503)
+    if monitor.lag * 1000 > READY_MAX_LOOP_LAG_MS:
+        return JSONResponse({"status": "not ready", "reason": "event loop lagging"}, status_code=503)
+    return JSONResponse({"status": "ready"})
@@ -0,0 +1,153 @@
+# invalidation.py
+# Fans cache invalidations out to every worker process (and every pod).
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# ENV
+INVALIDATION_BACKEND = os.getenv("INVALIDATION_BACKEND", "changestream")
+
+# Error code Mongo returns when change streams are not available
+# (standalone server, no replica set).
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+Callback = Callable[[str, object], None]
+
+
+class InvalidationBus:
+    """Delivers (topic, key) invalidations to local subscribers.
+
+    ``key=None`` means "drop everything under this topic". Subclasses decide
+    how invalidations published in one process reach the others.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callback] = []
+
+    def subscribe(self, callback: Callback):
+        self._subscribers.append(callback)
+
+    def dispatch(self, topic: str, key=None):
+        for callback in self._subscribers:
+            callback(topic, key)
+
+    def publish(self, topic: str, key=None):
+        self.dispatch(topic, key)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBroker:
+    """Stand-in for the cross-process transport in tests: every bus attached
+    to the same broker behaves like a separate worker process."""
+
+    def __init__(self):
+        self.buses: List["InMemoryBus"] = []
+
+    def bus(self) -> "InMemoryBus":
+        bus = InMemoryBus(self)
+        self.buses.append(bus)
+        return bus
+
+
+class InMemoryBus(InvalidationBus):
+    def __init__(self, broker: Optional[InMemoryBroker] = None):
+        super().__init__()
+        self.broker = broker
+
+    def publish(self, topic: str, key=None):
+        if self.broker is None:
+            self.dispatch(topic, key)
+            return
+        for bus in self.broker.buses:
+            bus.dispatch(topic, key)
+
+
+class ChangeStreamBus(InvalidationBus):
+    """Tails Mongo change streams so writes made by any worker invalidate
+    caches in every worker. ``publish`` only invalidates locally: the
+    writer's own process should not wait for the stream round trip, and the
+    stream will carry the change to everybody else.
+
+    ``topics`` maps a collection name to the document field caches are keyed
+    by for that collection.
+    """
+
+    def __init__(self, db, topics: Dict[str, str]):
+        super().__init__()
+        self._db = db
+        self._topics = topics
+        self._tasks: List[asyncio.Task] = []
+        self.supported = True
+
+    async def start(self):
+        for topic, key_field in self._topics.items():
+            self._tasks.append(asyncio.create_task(self._watch(topic, key_field)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _watch(self, topic: str, key_field: str):
+        pipeline = [{"$project": {"documentKey": 1, "operationType": 1, f"fullDocument.{key_field}": 1}}]
+        full_document = None if key_field == "_id" else "updateLookup"
+        resume_token = None
+        while True:
+            try:
+                async with self._db[topic].watch(
+                    pipeline, full_document=full_document, resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.dispatch(topic, _change_key(change, key_field))
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(
+                        "Change streams unavailable; %s caches fall back to TTL expiry", topic
+                    )
+                    self.supported = False
+                    return
+                logger.warning("Change stream on %s failed (%s); restarting", topic, e)
+                resume_token = None
+            except PyMongoError as e:
+                logger.warning("Change stream on %s interrupted (%s); retrying", topic, e)
+            # Events may have been missed while the stream was down.
+            self.dispatch(topic, None)
+            await asyncio.sleep(1)
+
+
+def _change_key(change: dict, key_field: str):
+    if key_field == "_id":
+        return change.get("documentKey", {}).get("_id")
+    return (change.get("fullDocument") or {}).get(key_field)
+
+
+# BUS
+_bus: InvalidationBus = InMemoryBus()
+
+
+def create_bus(db) -> InvalidationBus:
+    """``db`` is None without Mongo (STORAGE_BACKEND=memory): in-process only."""
+    global _bus
+    if INVALIDATION_BACKEND == "changestream" and db is not None:
+        _bus = ChangeStreamBus(db, {"seats": "_id", "employees": "w3_id"})
+    else:
+        _bus = InMemoryBus()
+    return _bus
+
+
+def get_bus() -> InvalidationBus:
+    return _bus
@@ -0,0 +1,191 @@
+# log_config.py
+# Non-blocking JSON logging with request ids and per-route debug sampling.
+#
+# LOG_LEVEL holds the level, optionally followed by debug sampling rates per
+# path pattern, separated by ";":
+#
+#   LOG_LEVEL="INFO"
+#   LOG_LEVEL="DEBUG;/book=0.1;/release/*=0.1;/auth/*=1;*=0.01"
+#
+# A DEBUG record emitted while serving a request whose path matches a
+# pattern is kept with that probability; the first matching pattern wins
+# and unmatched paths keep everything. Records at INFO and above are never
+# sampled.
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from typing import List, Optional, Tuple
+
+# ENV
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+REQUEST_ID_HEADER = "x-request-id"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+route_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("route", default=None)
+
+# Attributes every LogRecord has; anything else came in through ``extra``.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "route"}
+
+
+def parse_log_level(value: str) -> Tuple[int, List[Tuple[str, float]]]:
+    level_name, *rules = [part.strip() for part in value.split(";") if part.strip()] or ["INFO"]
+    level = logging.getLevelName(level_name.upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    sampling = []
+    for rule in rules:
+        pattern, _, rate = rule.partition("=")
+        try:
+            sampling.append((pattern.strip(), min(1.0, max(0.0, float(rate)))))
+        except ValueError:
+            continue
+    return level, sampling
+
+
+class DebugSampler(logging.Filter):
+    def __init__(self, rules: List[Tuple[str, float]]):
+        super().__init__()
+        self.rules = rules
+
+    def rate_for(self, path: Optional[str]) -> float:
+        if path is None:
+            return 1.0
+        for pattern, rate in self.rules:
+            if fnmatchcase(path, pattern):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not self.rules:
+            return True
+        rate = self.rate_for(route_var.get())
+        return rate >= 1.0 or random.random() < rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them.
+
+    The stock QueueHandler renders the message in the calling thread; here
+    only the request context is captured and ``msg % args`` is left to the
+    listener thread, so a log call on the hot path costs a filter check and
+    a queue put.
+    """
+
+    def prepare(self, record):
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+            entry["route"] = record.route
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+# LISTENER
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[ContextQueueHandler] = None
+_previous_level: Optional[int] = None
+
+
+def start(level_spec: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """Route the root logger through a queue drained by a background thread."""
+    global _listener, _handler, _previous_level
+    stop()
+    level, sampling = parse_log_level(level_spec)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    records = queue.SimpleQueue()
+    _handler = ContextQueueHandler(records)
+    _handler.addFilter(DebugSampler(sampling))
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    _previous_level = root.level
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop():
+    """Flush queued records and detach the handler."""
+    global _listener, _handler, _previous_level
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        root = logging.getLogger()
+        root.removeHandler(_handler)
+        root.setLevel(_previous_level)
+        _handler = None
+
+
+# REQUEST CONTEXT
+class RequestContextMiddleware:
+    """Tags everything logged while serving a request with its request id
+    (taken from X-Request-ID or generated) and echoes the id back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        id_token = request_id_var.set(request_id)
+        route_token = route_var.set(scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(id_token)
+            route_var.reset(route_token)
@@ -0,0 +1,171 @@
+# loop_monitor.py
+# Continuously measures how late the event loop runs scheduled work and, in
+# debug mode, reports whatever is holding the loop with its stack.
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# ENV
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "1200"))
+LOOP_DEBUG = os.getenv("LOOP_DEBUG", "false").lower() == "true"
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_samples, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(q * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+class LoopLagMonitor:
+    """Sleeps for a fixed interval and records how much later than asked the
+    loop woke it up. Anything hogging the loop shows up as lag.
+
+    With ``debug`` on, every loop callback is timed and a watchdog thread
+    looks at the one currently running. Once it has held the loop for longer
+    than ``block_threshold`` the watchdog grabs the loop thread's stack,
+    which points at the blocking call inside the coroutine, and logs it.
+    Timing single callbacks (rather than the gap between two heartbeats)
+    keeps a busy but healthy loop from being reported. This is much cheaper
+    than asyncio's own debug mode, so it can stay on under benchmark load.
+    uvloop callbacks cannot be timed; there the watchdog falls back to the
+    heartbeat.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL_SECONDS,
+        window: int = LOOP_LAG_WINDOW,
+        debug: bool = LOOP_DEBUG,
+        block_threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000,
+    ):
+        self.interval = interval
+        self.debug = debug
+        self.block_threshold = block_threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self.window = deque(maxlen=window)
+        self.blocked = deque(maxlen=20)
+        self.blocked_total = 0
+        self._heartbeat = time.monotonic()
+        self._callback_started: Optional[float] = None
+        self._timing_callbacks = False
+        self._original_handle_run = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def record(self, lag: float):
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.samples += 1
+        self.window.append(lag)
+
+    def reset(self):
+        self.lag = self.max_lag = 0.0
+        self.samples = 0
+        self.window.clear()
+        self.blocked.clear()
+        self.blocked_total = 0
+
+    def percentiles(self) -> dict:
+        ordered = sorted(self.window)
+        result = {f"p{round(q * 100)}": percentile(ordered, q) for q in QUANTILES}
+        result["max"] = self.max_lag
+        return result
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # The watchdog expects a beat at least every interval; wake up often
+        # enough that a healthy loop is never mistaken for a blocked one.
+        interval = min(self.interval, self.block_threshold / 2) if self.debug else self.interval
+        while True:
+            started = loop.time()
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(interval)
+            self._heartbeat = time.monotonic()
+            self.record(max(0.0, loop.time() - started - interval))
+
+    async def start(self):
+        self._task = asyncio.create_task(self.run())
+        if self.debug:
+            self._timing_callbacks = isinstance(asyncio.get_running_loop(), asyncio.BaseEventLoop)
+            if self._timing_callbacks:
+                self._install_callback_timer()
+            self._stopping.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch,
+                args=(threading.get_ident(), min(self.interval, self.block_threshold / 2)),
+                name="loop-watchdog",
+                daemon=True,
+            )
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        if self._original_handle_run is not None:
+            asyncio.events.Handle._run = self._original_handle_run
+            self._original_handle_run = None
+
+    def _install_callback_timer(self):
+        original = self._original_handle_run = asyncio.events.Handle._run
+        monitor = self
+
+        def _run(handle):
+            monitor._callback_started = time.monotonic()
+            try:
+                return original(handle)
+            finally:
+                monitor._callback_started = None
+
+        asyncio.events.Handle._run = _run
+
+    # WATCHDOG (runs in its own thread)
+    def _watch(self, loop_thread_id: int, beat_interval: float):
+        reported = None
+        while not self._stopping.wait(self.block_threshold / 4):
+            if self._timing_callbacks:
+                since = self._callback_started
+                if since is None:
+                    continue
+                stalled = time.monotonic() - since
+            else:
+                since = self._heartbeat
+                stalled = time.monotonic() - since - beat_interval
+            if stalled < self.block_threshold or reported == since:
+                continue
+            reported = since
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.blocked.append({"blocked_ms": round(stalled * 1000, 1), "stack": stack})
+            self.blocked_total += 1
+            logger.warning(
+                "Event loop blocked for over %.0f ms; loop thread is at:\n%s",
+                stalled * 1000,
+                stack,
+            )
+
+
+monitor = LoopLagMonitor()
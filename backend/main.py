@@ -1,33 +1,120 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
-from datetime import datetime, timedelta
+import json
+from datetime import date, datetime, timedelta
 
 BOOKING_COOLDOWN = timedelta(minutes=45)
-SEAT_COST = 5
-
+SEATS_PER_FLOOR = 25
+SEATS_PER_ROW = 5
+MAX_RECOMMENDATIONS = 50
+# floor plan coordinates are small; anything beyond this is not a seat
+MAX_COORDINATE = 10_000
+
+from pymongo.errors import PyMongoError
+
+import database
+import health
+import log_config
+import metrics
+import invalidation
+from loop_monitor import monitor as loop_monitor
+import cache
+import seat_mirror
+import tracing
+import admin
+import capture
+import compression
+import concurrency
+import recurrence
+import repository
+from singleflight import SingleFlight
+from seat_table import DEFAULT_FLOOR, STATUSES, SeatTable
+from repository import get_repository, get_read_repository
 from auth import router as auth_router, get_current_user
+from schemas import SEAT_COST, me_response
+
+logger = logging.getLogger(__name__)
 
 # ENV
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 SESSION_SECRET = os.getenv("SESSION_SECRET", "default-secret-change-in-production")
 
-# DB
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.office_booking_db
-seats_collection = db.seats
-employees_collection = db.employees
+# LIFESPAN
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits on Mongo: the client connects lazily and seeding
+    # runs in the background, gated by /readyz rather than by startup.
+    log_config.start()
+    tracing.configure()
+    capture.start()
+    health.mark_not_ready("starting")
+    await loop_monitor.start()
+    repo = get_repository()
+    # the bus and the mirror follow Mongo change streams; in memory there
+    # is nothing to follow
+    in_mongo = isinstance(repo, repository.MongoRepository)
+    if in_mongo:
+        database.connect()
+    bus = invalidation.create_bus(database.get_db() if in_mongo else None)
+    cache.install(bus)
+    await bus.start()
+    mirror = seat_mirror.create_mirror(repo.seats) if in_mongo else None
+    if mirror:
+        await mirror.start()
+    warm_up_task = asyncio.create_task(warm_up(repo))
+    yield
+    warm_up_task.cancel()
+    await asyncio.gather(warm_up_task, return_exceptions=True)
+    if mirror:
+        await mirror.stop()
+    await bus.stop()
+    await loop_monitor.stop()
+    database.close()
+    capture.stop()
+    tracing.shutdown()
+    log_config.stop()
+
+
+async def warm_up(repo):
+    delay = 0.5
+    while True:
+        try:
+            await seed(repo)
+            await repo.ensure_indexes()
+            health.mark_ready()
+            return
+        except concurrency.IndexMissing as e:
+            # bookings would duplicate employees: stay out of rotation
+            logger.error("%s; retrying in %ss", e, delay)
+            health.mark_not_ready("indexes missing")
+        except PyMongoError as e:
+            logger.warning("Startup seed failed (%s); retrying in %ss", e, delay)
+            health.mark_not_ready("database unavailable")
+        except Exception:
+            # anything else (a bad seed document, a bug) must not end the
+            # task and leave the pod unready for good without a trace
+            logger.exception("Startup warm-up failed; retrying in %ss", delay)
+            health.mark_not_ready("warm-up failed")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 10)
 
 # APP
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth_router)
+app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(recurrence.router)
+app.include_router(admin.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,8 +127,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Read-Preference",
+        "X-Snapshot-Max-Staleness",
+        "X-Snapshot-Read-At",
+        "X-Request-ID",
+        "X-Trace-ID",
+    ],
 )
 
+# Everything except the seat snapshot, which is pre-compressed per version
+# (GZipMiddleware leaves responses that already carry Content-Encoding alone).
+app.add_middleware(GZipMiddleware, minimum_size=compression.COMPRESSION_MIN_BYTES)
+
+# Replay captures (CAPTURE_FILE); inside SessionMiddleware to see the user
+if capture.CAPTURE_FILE:
+    app.add_middleware(capture.CaptureMiddleware)
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=SESSION_SECRET,
@@ -49,12 +151,23 @@ app.add_middleware(
     https_only=False,
 )
 
+app.add_middleware(log_config.RequestContextMiddleware)
+
+app.add_middleware(tracing.TracingMiddleware)
+
+# outermost, so route timings include every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # MODELS
 class Seat(BaseModel):
     id: int = Field(alias="_id")
     status: str
     price: int
     booked_by: Optional[str] = None
+    floor: int = DEFAULT_FLOOR
+    x: Optional[float] = None
+    y: Optional[float] = None
+    zone: Optional[str] = None
 
     class Config:
         populate_by_name = True
@@ -64,119 +177,307 @@ class BookingRequest(BaseModel):
     date: str
     time_slot: str
 
+# READ COALESCING
+seat_reads = SingleFlight()
+employee_reads = SingleFlight()
+
 # STARTUP
-@app.on_event("startup")
-async def seed():
-    if await seats_collection.count_documents({}) == 0:
-        await seats_collection.insert_many(
-            [{"_id": i, "status": "available", "price": 5} for i in range(1, 101)]
-        )
+def seed_document(seat_id: int):
+    position = (seat_id - 1) % SEATS_PER_FLOOR
+    x, y = position % SEATS_PER_ROW, position // SEATS_PER_ROW
+    return {
+        "_id": seat_id,
+        "status": "available",
+        "price": 5,
+        "floor": (seat_id - 1) // SEATS_PER_FLOOR + 1,
+        "x": float(x),
+        "y": float(y),
+        "zone": "A" if x < SEATS_PER_ROW / 2 else "B",
+        "version": 0,
+    }
+
+
+async def seed(repo):
+    await repo.seed_seats([seed_document(i) for i in range(1, 101)])
 
 # ROUTES
 
 @app.get("/me")
-async def me(user=Depends(get_current_user)):
+async def me(
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+    reader=Depends(get_read_repository),
+):
+    w3_id = user["w3_id"]
+    # right after this worker booked or released, read our own write back
+    # from the primary
+    primary = cache.employee_cache.needs_primary(w3_id)
+    source = repo if primary else reader
+    employee = await cache.employee_cache.get_or_load(
+        w3_id,
+        lambda: employee_reads.do(
+            (w3_id, cache.employee_cache.generation, primary),
+            lambda: source.get_employee(w3_id),
+        ),
+    )
+    return me_response(user, employee)
+
+
+@app.get("/db/pool")
+async def db_pool(user=Depends(get_current_user)):
     return {
-        "w3_id": user["w3_id"],
-        "name": user.get("name"),
-        "email": user.get("email"),
+        "options": database.pool_options(),
+        "stats": database.pool_stats.as_dict(),
     }
 
 
-@app.get("/seats", response_model=List[Seat])
-async def get_seats(user=Depends(get_current_user)):
-    return await seats_collection.find().to_list(1000)
+async def _load_seat_list(reader):
+    async def read():
+        seats = await reader.list_seats()
+        return seats, datetime.utcnow().isoformat() + "Z"
 
-@app.post("/book")
-async def book_seat(payload: BookingRequest, user=Depends(get_current_user)):
-    employee = await employees_collection.find_one({"w3_id": user["w3_id"]})
-
-    # already has an active seat
-    if employee and employee.get("last_booked_seat"):
-        raise HTTPException(
-            status_code=400,
-            detail="You already have an active booking. Release it first.",
+    # Keyed on the generation: a read that started before a write must not
+    # be joined by requests that arrive after it.
+    return await seat_reads.do(("seats", cache.seat_cache.generation), read)
+
+
+async def _load_seat_table(reader):
+    async def read():
+        table = SeatTable()
+        table.load(await reader.list_seats(limit=None))
+        return table
+
+    return await seat_reads.do(("table", cache.seat_cache.generation), read)
+
+
+SEAT_FIELDS = tuple(field.alias or name for name, field in Seat.model_fields.items())
+SEAT_DEFAULTS = {
+    field.alias or name: field.default for name, field in Seat.model_fields.items() if not field.is_required()
+}
+
+seat_snapshots = compression.SnapshotCache()
+
+
+def render_seats(seats, shape: str) -> bytes:
+    if shape == "columnar":
+        # parallel arrays: far fewer repeated keys on large floors
+        payload = {
+            field: [seat.get(field, SEAT_DEFAULTS.get(field)) for seat in seats]
+            for field in SEAT_FIELDS
+        }
+    else:
+        payload = [
+            {field: seat.get(field, SEAT_DEFAULTS.get(field)) for field in SEAT_FIELDS}
+            for seat in seats
+        ]
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+@app.get("/seats", response_model=List[Seat])
+async def get_seats(
+    request: Request,
+    status: Optional[Literal["available", "occupied"]] = None,
+    shape: Literal["rows", "columnar"] = "rows",
+    user=Depends(get_current_user),
+    reader=Depends(get_read_repository),
+):
+    mirror = seat_mirror.get_mirror()
+    if mirror and mirror.ready:
+        headers = {"X-Read-Preference": "mirror"}
+        read_at = mirror.synced_at.isoformat() + "Z"
+        version = ("mirror", id(mirror.table), mirror.table.version)
+        seats = lambda: mirror.table.rows(status)
+    else:
+        cached, read_at = await cache.seat_cache.get_or_load(
+            cache.SEAT_LIST,
+            lambda: _load_seat_list(reader),
+        )
+        headers = database.snapshot_headers()
+        version = ("cache", cache.seat_cache.generation, read_at)
+        seats = lambda: [seat for seat in cached if not status or seat["status"] == status]
+
+    body, encoding = seat_snapshots.get(
+        version,
+        f"{shape}:{status}",
+        request.headers.get("accept-encoding"),
+        lambda: render_seats(seats(), shape),
+    )
+    headers["X-Snapshot-Read-At"] = read_at
+    headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/seats/count")
+async def count_seats(
+    status: Optional[Literal["available", "occupied"]] = None,
+    user=Depends(get_current_user),
+    reader=Depends(get_read_repository),
+):
+    mirror = seat_mirror.get_mirror()
+    if mirror and mirror.ready:
+        return {"status": status, "count": mirror.table.count(status)}
+    return {"status": status, "count": await reader.count_seats(status)}
+
+
+@app.get("/seats/summary")
+async def seats_summary(
+    user=Depends(get_current_user),
+    reader=Depends(get_read_repository),
+):
+    mirror = seat_mirror.get_mirror()
+    if mirror and mirror.ready:
+        per_floor = mirror.table.summary()
+    else:
+        per_floor = await reader.seat_counts()
+
+    floors = [{"floor": floor, **per_floor[floor]} for floor in sorted(per_floor)]
+    totals = {status: sum(f.get(status, 0) for f in floors) for status in STATUSES}
+    return {"floors": floors, **totals}
+
+@app.get("/seats/recommend")
+async def recommend_seats(
+    x: Optional[float] = Query(None, ge=-MAX_COORDINATE, le=MAX_COORDINATE),
+    y: Optional[float] = Query(None, ge=-MAX_COORDINATE, le=MAX_COORDINATE),
+    floor: Optional[int] = None,
+    zone: Optional[str] = None,
+    teammates: Optional[str] = None,
+    k: int = Query(5, ge=1, le=MAX_RECOMMENDATIONS),
+    user=Depends(get_current_user),
+    reader=Depends(get_read_repository),
+):
+    mirror = seat_mirror.get_mirror()
+    if mirror and mirror.ready:
+        table = mirror.table
+    else:
+        # built once per cache generation, from every seat rather than the
+        # capped list /seats serves
+        table = await cache.seat_cache.get_or_load(
+            cache.SEAT_TABLE,
+            lambda: _load_seat_table(reader),
         )
 
-    # cooldown check ONLY if user still has a seat
-    if (
-        employee
-        and employee.get("last_booked_seat")
-        and employee.get("last_booking_at")
-    ):
-        last = employee["last_booking_at"]
-        if datetime.utcnow() - last < BOOKING_COOLDOWN:
+    if teammates:
+        # centre on teammates' current seats, on the floor most of them sit on
+        w3_ids = [w3_id.strip() for w3_id in teammates.split(",") if w3_id.strip()]
+        positions = [
+            position
+            for employee in await reader.seated_employees(w3_ids)
+            if (position := table.position(employee["last_booked_seat"])) is not None
+        ]
+        if not positions:
+            raise HTTPException(status_code=404, detail="No teammates with a booked seat")
+        if floor is None:
+            floors = [p[0] for p in positions]
+            floor = max(set(floors), key=floors.count)
+        on_floor = [p for p in positions if p[0] == floor] or positions
+        x = sum(p[1] for p in on_floor) / len(on_floor)
+        y = sum(p[2] for p in on_floor) / len(on_floor)
+    elif x is None or y is None or floor is None:
+        raise HTTPException(status_code=422, detail="Provide x, y and floor, or teammates")
+
+    return {
+        "origin": {"x": x, "y": y, "floor": floor},
+        "seats": table.nearest_available(x, y, k, floor=floor, zone=zone),
+    }
+
+
+@app.post("/book")
+async def book_seat(
+    payload: BookingRequest,
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    # Both writes are compare-and-swaps on the versions read below; losing
+    # either one re-runs the whole attempt (see concurrency.py).
+    async def attempt():
+        employee = await repo.get_employee(user["w3_id"])
+
+        # already has an active seat
+        if employee and employee.get("last_booked_seat"):
             raise HTTPException(
                 status_code=400,
-                detail="You can book only once every 45 minutes.",
+                detail="You already have an active booking. Release it first.",
             )
 
-
-    seat = await seats_collection.find_one({"_id": payload.seat_id})
-    if not seat or seat["status"] == "occupied":
-        raise HTTPException(status_code=400, detail="Seat unavailable")
-
-    # update seat
-    await seats_collection.update_one(
-        {"_id": payload.seat_id},
-        {
-            "$set": {
-                "status": "occupied",
-                "booked_by": user["w3_id"],
-                "booking_time": datetime.utcnow(),
-            }
-        },
-    )
-
-    # update employee (INCLUDING blue tokens)
-    await employees_collection.update_one(
-        {"w3_id": user["w3_id"]},
-        {
-            "$addToSet": {"booked_seats": payload.seat_id},
-            "$inc": {"blue_tokens_spent": SEAT_COST},
-            "$set": {
-                "last_booking_at": datetime.utcnow(),
-                "last_booked_seat": payload.seat_id,
-            },
-        },
-        upsert=True,
-    )
+        # cooldown check ONLY if user still has a seat
+        if (
+            employee
+            and employee.get("last_booked_seat")
+            and employee.get("last_booking_at")
+        ):
+            last = employee["last_booking_at"]
+            if datetime.utcnow() - last < BOOKING_COOLDOWN:
+                raise HTTPException(
+                    status_code=400,
+                    detail="You can book only once every 45 minutes.",
+                )
+
+        seat = await repo.get_seat(payload.seat_id)
+        if not seat or seat["status"] == "occupied":
+            raise HTTPException(status_code=400, detail="Seat unavailable")
+        if await repo.reserved_by_other(payload.seat_id, user["w3_id"], recurrence.to_datetime(date.today())):
+            raise HTTPException(status_code=400, detail="Seat reserved for today")
+
+        # claim the seat (only if still free and unchanged since we read it)
+        await repo.claim_seat(seat, user["w3_id"], datetime.utcnow())
+
+        # update employee (INCLUDING blue tokens)
+        try:
+            await repo.record_booking(employee, user["w3_id"], payload.seat_id, SEAT_COST, datetime.utcnow())
+        except concurrency.Conflict:
+            # The employee changed under us, e.g. a parallel request booked
+            # another seat: hand this one back before trying again.
+            await repo.unclaim_seat(payload.seat_id, user["w3_id"], concurrency.next_version(seat))
+            invalidation.get_bus().publish("seats", payload.seat_id)
+            raise
+
+    try:
+        await concurrency.retry(attempt)
+    except concurrency.Conflict:
+        raise HTTPException(status_code=409, detail="Too many concurrent bookings, please retry")
+
+    invalidation.get_bus().publish("seats", payload.seat_id)
+    if seat_mirror.get_mirror():
+        seat_mirror.get_mirror().apply_local(payload.seat_id, status="occupied", booked_by=user["w3_id"])
+    cache.employee_cache.wrote(user["w3_id"])
+    invalidation.get_bus().publish("employees", user["w3_id"])
+    logger.debug("Seat booked", extra={"seat_id": payload.seat_id, "w3_id": user["w3_id"]})
 
     return {"message": "Seat booked"}
 
 @app.post("/release/{seat_id}")
-async def release_seat(seat_id: int, user=Depends(get_current_user)):
-    seat = await seats_collection.find_one({"_id": seat_id})
-
-    # seat not owned by user
-    if not seat or seat.get("booked_by") != user["w3_id"]:
-        raise HTTPException(status_code=403, detail="Not allowed")
-
-    # release the seat
-    await seats_collection.update_one(
-        {"_id": seat_id},
-        {
-            "$set": {
-                "status": "available",
-                "booked_by": None,
-                "booking_time": None,
-            }
-        },
-    )
-
-    # update employee (refund blue tokens + clear booking)
-    await employees_collection.update_one(
-    {"w3_id": user["w3_id"]},
-    {
-        "$inc": {"blue_tokens_spent": -SEAT_COST},
-        "$pull": {"booked_seats": seat_id},
-        "$set": {
-            "last_booked_seat": None,
-            "last_booking_at": None,  # 👈 reset cooldown
-        },
-    },
-)
-
+async def release_seat(
+    seat_id: int,
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    async def attempt():
+        seat = await repo.get_seat(seat_id)
+
+        # seat not owned by user
+        if not seat or seat.get("booked_by") != user["w3_id"]:
+            raise HTTPException(status_code=403, detail="Not allowed")
+
+        # release the seat (only if this user still holds it, at the version read)
+        await repo.free_seat(seat, user["w3_id"])
+
+    try:
+        await concurrency.retry(attempt)
+    except concurrency.Conflict:
+        raise HTTPException(status_code=409, detail="Seat is being updated, please retry")
+    invalidation.get_bus().publish("seats", seat_id)
+    if seat_mirror.get_mirror():
+        seat_mirror.get_mirror().apply_local(seat_id, status="available", booked_by=None)
+
+    # update employee (refund blue tokens + clear booking, which resets the
+    # cooldown); matching on the seat makes the refund happen once however
+    # often this runs
+    await repo.refund_booking(user["w3_id"], seat_id, SEAT_COST)
+    cache.employee_cache.wrote(user["w3_id"])
+    invalidation.get_bus().publish("employees", user["w3_id"])
+    logger.debug("Seat released", extra={"seat_id": seat_id, "w3_id": user["w3_id"]})
 
     return {
         "message": "Seat released",
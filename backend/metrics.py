@@ -0,0 +1,136 @@
+# metrics.py
+# Per-route request metrics and event-loop lag, exposed at /metrics.
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import concurrency
+from loop_monitor import QUANTILES, monitor
+
+router = APIRouter(tags=["Metrics"])
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RouteStats:
+    __slots__ = ("count", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float, status: int):
+        self.count += 1
+        self.total += seconds
+        if status >= 500:
+            self.errors += 1
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th request."""
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+routes: Dict[Tuple[str, str], RouteStats] = {}
+
+
+def reset():
+    routes.clear()
+
+
+class MetricsMiddleware:
+    """Times every HTTP request against its route template (``/release/{seat_id}``,
+    not the concrete path) so the label set stays small."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "<unmatched>"
+            key = (scope["method"], path)
+            stats = routes.get(key)
+            if stats is None:
+                stats = routes[key] = RouteStats()
+            stats.observe(time.perf_counter() - started, status)
+
+
+def snapshot() -> dict:
+    return {
+        "routes": {
+            f"{method} {path}": {
+                "count": stats.count,
+                "errors": stats.errors,
+                "mean_ms": stats.total / stats.count * 1000 if stats.count else 0.0,
+                **{f"p{round(q * 100)}_ms": stats.quantile(q) * 1000 for q in QUANTILES},
+            }
+            for (method, path), stats in sorted(routes.items())
+        },
+        "event_loop_lag_ms": {k: v * 1000 for k, v in monitor.percentiles().items()},
+        "event_loop_blocked": monitor.blocked_total,
+        "cas": dict(concurrency.stats),
+    }
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path), stats in sorted(routes.items()):
+        labels = f'method="{method}",route="{path}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS, stats.buckets):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.total}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.count}")
+    lines.append("# TYPE http_request_errors_total counter")
+    for (method, path), stats in sorted(routes.items()):
+        lines.append(f'http_request_errors_total{{method="{method}",route="{path}"}} {stats.errors}')
+
+    lag = monitor.percentiles()
+    lines.append("# TYPE event_loop_lag_seconds summary")
+    for q in QUANTILES:
+        lines.append(f'event_loop_lag_seconds{{quantile="{q}"}} {lag[f"p{round(q * 100)}"]}')
+    lines.append(f"event_loop_lag_seconds_count {monitor.samples}")
+    lines.append("# TYPE event_loop_lag_max_seconds gauge")
+    lines.append(f"event_loop_lag_max_seconds {lag['max']}")
+    lines.append("# TYPE event_loop_blocked_total counter")
+    lines.append(f"event_loop_blocked_total {monitor.blocked_total}")
+    for name in ("attempts", "conflicts", "exhausted"):
+        lines.append(f"# TYPE booking_cas_{name}_total counter")
+        lines.append(f"booking_cas_{name}_total {concurrency.stats[name]}")
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_prometheus()
@@ -0,0 +1,287 @@
+# recurrence.py
+# Recurring and bulk advance reservations.
+#
+# A reservation is stored as one rule -- seat, date range, the weekdays it
+# repeats on and any dates skipped -- instead of one document per day, and
+# its occurrences are expanded only when somebody asks for them. A month of
+# weekday bookings is a single small document.
+#
+# Rule documents in the ``reservations`` collection:
+#
+#   {"seat_id": 12, "w3_id": "...", "start": <datetime>, "end": <datetime>,
+#    "weekdays": [0, 1, 2, 3, 4], "except": [<datetime>, ...],
+#    "time_slot": "9:00 AM", "created_at": <datetime>}
+#
+# Dates are stored as midnight datetimes (BSON has no date type); weekdays
+# follow date.weekday(), Monday = 0. A rule holds its seat for the whole day.
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterator, List, Literal, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from auth import get_current_user
+from repository import get_repository
+
+router = APIRouter(prefix="/reservations", tags=["Reservations"])
+
+# ENV
+RESERVATION_HORIZON_DAYS = int(os.getenv("RESERVATION_HORIZON_DAYS", "90"))
+
+MAX_RULES_PER_REQUEST = 50
+DEFAULT_WINDOW_DAYS = 14
+WORKDAYS = [0, 1, 2, 3, 4]
+
+# What the booking UI sends instead of dates.
+DATE_LABELS = {"today": 0, "tomorrow": 1, "day after": 2}
+
+
+# DATES
+def resolve_date(value: str, today: Optional[date] = None) -> date:
+    """A date from "Today" / "Tomorrow" / "Day After" or an ISO string."""
+    today = today or date.today()
+    offset = DATE_LABELS.get(value.strip().lower())
+    if offset is not None:
+        return today + timedelta(days=offset)
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Unrecognised date {value!r}") from None
+
+
+def to_datetime(day: date) -> datetime:
+    return datetime.combine(day, time())
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def occurrences(rule: dict, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[date]:
+    """Dates ``rule`` holds its seat on, optionally clipped to [start, end]."""
+    first, last = _day(rule["start"]), _day(rule["end"])
+    if start is not None:
+        first = max(first, start)
+    if end is not None:
+        last = min(last, end)
+    weekdays = set(rule["weekdays"])
+    skipped = {_day(d) for d in rule.get("except", ())}
+    day = first
+    while day <= last:
+        if day.weekday() in weekdays and day not in skipped:
+            yield day
+        day += timedelta(days=1)
+
+
+# CONFLICTS
+def plan(rules: List[dict], candidates: List[dict], w3_id: str, today: date, on_conflict: str = "reject"):
+    """Check ``rules`` against the aggregation output and each other.
+
+    ``candidates`` is what ``Repository.reservation_candidates`` returned.
+    Returns (accepted, conflicts). With ``on_conflict="skip"`` clashing dates
+    go into a rule's ``except`` list and the rest is kept; with "reject" a
+    rule with any clash is dropped. Raises HTTPException for unknown seats.
+    """
+    window = (min(r["start"] for r in rules).date(), max(r["end"] for r in rules).date())
+    known_seats = set()
+    seat_taken: Dict[int, set] = defaultdict(set)
+    # Days the employee already holds a seat. The value is the seat that may
+    # be reserved again that day (the one they booked via /book), or None
+    # when an existing rule covers the day and any new rule would clash.
+    mine: Dict[date, Optional[int]] = {}
+    for c in candidates:
+        if c.get("live"):
+            known_seats.add(c["seat_id"])
+            if c.get("status") == "occupied":
+                if c.get("w3_id") == w3_id:
+                    mine[today] = c["seat_id"]
+                else:
+                    seat_taken[c["seat_id"]].add(today)
+            continue
+        days = occurrences(c, *window)
+        if c["w3_id"] == w3_id:
+            mine.update(dict.fromkeys(days))
+        else:
+            seat_taken[c["seat_id"]].update(days)
+
+    unknown = sorted({r["seat_id"] for r in rules} - known_seats)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Seat {unknown[0]} not found")
+
+    accepted, conflicts = [], []
+    for rule in rules:
+        seat_id = rule["seat_id"]
+        days = list(occurrences(rule))
+        clash = [d for d in days if d in seat_taken[seat_id] or (d in mine and mine[d] != seat_id)]
+        if clash:
+            conflicts.append({"seat_id": seat_id, "dates": [d.isoformat() for d in clash]})
+            if on_conflict == "reject" or len(clash) == len(days):
+                continue
+            rule["except"] = [to_datetime(d) for d in clash]
+            days = list(occurrences(rule))
+        mine.update(dict.fromkeys(days))
+        accepted.append(rule)
+    return accepted, conflicts
+
+
+def public(rule: dict) -> dict:
+    return {
+        "id": str(rule["_id"]),
+        "seat_id": rule["seat_id"],
+        "start": _day(rule["start"]).isoformat(),
+        "end": _day(rule["end"]).isoformat(),
+        "weekdays": rule["weekdays"],
+        "except": [_day(d).isoformat() for d in rule.get("except", ())],
+        "time_slot": rule["time_slot"],
+    }
+
+
+# MODELS
+class RecurrenceRule(BaseModel):
+    seat_id: int
+    start: str
+    # defaults to ``start``: a single day
+    end: Optional[str] = None
+    # defaults to Monday-Friday for ranges, the start's weekday for one day
+    weekdays: Optional[List[int]] = None
+    time_slot: str
+
+
+class BulkReservationRequest(BaseModel):
+    rules: List[RecurrenceRule] = Field(min_length=1, max_length=MAX_RULES_PER_REQUEST)
+    on_conflict: Literal["reject", "skip"] = "reject"
+
+
+def rule_document(rule: RecurrenceRule, w3_id: str, today: date) -> dict:
+    try:
+        start = resolve_date(rule.start, today)
+        end = resolve_date(rule.end, today) if rule.end else start
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start < today:
+        raise HTTPException(status_code=400, detail="Reservations cannot start in the past")
+    if end < start:
+        raise HTTPException(status_code=400, detail="Reservation ends before it starts")
+    if end > today + timedelta(days=RESERVATION_HORIZON_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Reservations can be made at most {RESERVATION_HORIZON_DAYS} days ahead",
+        )
+    weekdays = rule.weekdays
+    if weekdays is None:
+        weekdays = [start.weekday()] if start == end else WORKDAYS
+    if not weekdays or any(d not in range(7) for d in weekdays):
+        raise HTTPException(status_code=400, detail="weekdays must be 0 (Monday) to 6 (Sunday)")
+    return {
+        "seat_id": rule.seat_id,
+        "w3_id": w3_id,
+        "start": to_datetime(start),
+        "end": to_datetime(end),
+        "weekdays": sorted(set(weekdays)),
+        "except": [],
+        "time_slot": rule.time_slot,
+        "created_at": datetime.utcnow(),
+    }
+
+
+# ROUTES
+@router.post("/bulk")
+async def bulk_reserve(
+    payload: BulkReservationRequest,
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    today = date.today()
+    w3_id = user["w3_id"]
+    rules = [rule_document(r, w3_id, today) for r in payload.rules]
+    rules = [r for r in rules if next(occurrences(r), None) is not None]
+    if not rules:
+        raise HTTPException(status_code=400, detail="No dates match the requested weekdays")
+
+    candidates = await repo.reservation_candidates(rules, w3_id)
+    accepted, conflicts = plan(rules, candidates, w3_id, today, payload.on_conflict)
+    if conflicts and payload.on_conflict == "reject":
+        raise HTTPException(status_code=409, detail={"message": "Seat already reserved", "conflicts": conflicts})
+
+    if accepted:
+        inserted = await repo.insert_reservations(accepted)
+        # Another request may have passed the same check concurrently. Look
+        # again now that our rules are visible; whoever sees a clash backs
+        # off, so at worst both retry and never both keep the seat.
+        candidates = await repo.reservation_candidates(accepted, w3_id, exclude=inserted)
+        _, raced = plan([dict(r) for r in accepted], candidates, w3_id, today, "reject")
+        if raced:
+            await repo.delete_reservations(inserted)
+            raise HTTPException(status_code=409, detail={"message": "Seat reserved concurrently, retry", "conflicts": raced})
+
+    return {
+        "created": [
+            {**public(r), "occurrences": sum(1 for _ in occurrences(r))} for r in accepted
+        ],
+        "conflicts": conflicts,
+    }
+
+
+@router.get("")
+async def list_reservations(
+    start: str = Query("Today"),
+    end: Optional[str] = Query(None),
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    """The caller's rules and, expanded from them, each reserved day in the window."""
+    try:
+        first = resolve_date(start)
+        last = resolve_date(end) if end else first + timedelta(days=DEFAULT_WINDOW_DAYS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if (last - first).days > RESERVATION_HORIZON_DAYS:
+        raise HTTPException(status_code=400, detail="Window too large")
+
+    rules = await repo.list_reservations(user["w3_id"], to_datetime(first), to_datetime(last))
+    days = sorted(
+        (day, rule["seat_id"], rule["time_slot"], str(rule["_id"]))
+        for rule in rules
+        for day in occurrences(rule, first, last)
+    )
+    return {
+        "rules": [public(r) for r in rules],
+        "occurrences": [
+            {"date": day.isoformat(), "seat_id": seat_id, "time_slot": slot, "reservation_id": rid}
+            for day, seat_id, slot, rid in days
+        ],
+    }
+
+
+@router.get("/occupancy")
+async def reserved_seats(
+    day: str = Query("Today", alias="date"),
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    """Seat ids held by a reservation on ``date``, for the seat map's day picker."""
+    try:
+        resolved = resolve_date(day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    seat_ids = await repo.reserved_seat_ids(to_datetime(resolved))
+    return {"date": resolved.isoformat(), "seat_ids": seat_ids}
+
+
+@router.delete("/{reservation_id}")
+async def cancel_reservation(
+    reservation_id: str,
+    user=Depends(get_current_user),
+    repo=Depends(get_repository),
+):
+    try:
+        oid = ObjectId(reservation_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    if not await repo.cancel_reservation(oid, user["w3_id"]):
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return {"message": "Reservation cancelled"}
@@ -0,0 +1,719 @@
+# repository.py
+# Storage behind one interface: every seat, employee and reservation
+# operation the routes need, implemented once over Motor and once in memory.
+#
+# STORAGE_BACKEND=mongo (default) talks to MONGO_URL. STORAGE_BACKEND=memory
+# keeps everything in process, for tests, benchmarks and offline CI. The
+# in-memory engine gives the same guarantees the routes rely on from Mongo:
+# each operation is atomic on its document, conditional writes either apply
+# completely or report a miss, and every operation yields to the event loop
+# first, so concurrent requests interleave between operations as they would
+# against a real server.
+import asyncio
+import copy
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import concurrency
+import database
+import tracing
+from concurrency import Conflict
+from schemas import employee_document
+from seat_table import DEFAULT_FLOOR, STATUSES
+
+# ENV
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+# /seats has always returned at most this many seats
+SEAT_LIST_LIMIT = 1000
+
+
+def _free(update: Optional[dict] = None) -> dict:
+    return {"status": "available", "booked_by": None, "booking_time": None, **(update or {})}
+
+
+def _refund(cost: int) -> dict:
+    return {"blue_tokens_spent": -cost}
+
+
+class Repository(ABC):
+    """What the app needs from storage. Conditional writes that can lose to
+    a concurrent writer raise ``concurrency.Conflict``."""
+
+    def reader(self) -> "Repository":
+        """The same data for reads that may be slightly stale."""
+        return self
+
+    async def ping(self):
+        pass
+
+    async def ensure_indexes(self):
+        pass
+
+    # SEATS
+    @abstractmethod
+    async def seed_seats(self, docs: List[dict]):
+        """Insert ``docs`` unless there are seats already."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_seats(self, limit: Optional[int] = SEAT_LIST_LIMIT) -> List[dict]:
+        """Seats in id order; ``limit=None`` for all of them."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_seats(self, status: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def seat_counts(self) -> Dict[int, Dict[str, int]]:
+        """{floor: {status: count}}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_seat(self, seat_id: int) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def claim_seat(self, seat: dict, w3_id: str, now: datetime):
+        """Occupy ``seat`` if it is still available at the version read."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def unclaim_seat(self, seat_id: int, w3_id: str, version: int):
+        """Undo claim_seat, unless the seat has moved on since."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def free_seat(self, seat: dict, w3_id: str):
+        """Release ``seat`` if ``w3_id`` still holds it at the version read."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def occupied_batches(self, criteria: dict, batch_size: int) -> AsyncIterator[List[dict]]:
+        """Occupied seats matching ``criteria`` (floor, zone, booked_before)
+        as batches of {"_id", "booked_by"}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release_seats(self, seats: List[dict]) -> int:
+        """Free each seat still held by the ``booked_by`` given with it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def reprice_seats(self, criteria: dict, price: int) -> Tuple[int, int]:
+        """(matched, updated). Seats already at ``price`` are left alone, so
+        their version does not move under concurrent bookings."""
+        raise NotImplementedError
+
+    # EMPLOYEES
+    @abstractmethod
+    async def get_employee(self, w3_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_employees(self) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def seated_employees(self, w3_ids: List[str]) -> List[dict]:
+        """Those of ``w3_ids`` with a current seat, as {"w3_id", "last_booked_seat"}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def login_employee(self, w3_id: str, claims: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def record_booking(self, employee: Optional[dict], w3_id: str, seat_id: int, cost: int, now: datetime):
+        """Charge ``w3_id`` for ``seat_id`` if the employee is unchanged
+        since read (``employee`` None: not there yet)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def refund_booking(self, w3_id: str, seat_id: int, cost: int) -> bool:
+        """Refund ``seat_id`` once: only while the employee still lists it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def refund_bookings(self, seats: List[dict], cost: int) -> int:
+        """refund_booking for each {"_id", "booked_by"}, in one round trip."""
+        raise NotImplementedError
+
+    # RESERVATIONS
+    @abstractmethod
+    async def reservation_candidates(self, rules: List[dict], w3_id: str, exclude: Optional[list] = None) -> List[dict]:
+        """Every stored rule that could clash with ``rules`` (same seat or
+        same employee, overlapping range, a shared weekday), then the live
+        state of the requested seats flagged ``live``. Exact per-date checks
+        are left to the caller."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_reservations(self, rules: List[dict]) -> list:
+        """Store ``rules``, setting their ``_id``; returns the ids."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_reservations(self, ids: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_reservations(self, w3_id: str, first: datetime, last: datetime) -> List[dict]:
+        """``w3_id``'s rules overlapping [first, last], by start."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def reserved_seat_ids(self, at: datetime) -> List[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def reserved_by_other(self, seat_id: int, w3_id: str, at: datetime) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def cancel_reservation(self, reservation_id: ObjectId, w3_id: str) -> bool:
+        raise NotImplementedError
+
+
+# MONGO
+def seat_query(criteria: dict) -> dict:
+    query = {}
+    if criteria.get("floor") is not None:
+        query["floor"] = criteria["floor"]
+    if criteria.get("zone") is not None:
+        query["zone"] = criteria["zone"]
+    if criteria.get("booked_before") is not None:
+        query["booking_time"] = {"$lt": criteria["booked_before"]}
+    return query
+
+
+def conflict_pipeline(rules: List[dict], w3_id: str, exclude: Optional[list] = None) -> list:
+    """reservation_candidates as one aggregation: the rules match on seat or
+    employee, range and weekdays ($in is the index-friendly weekday set
+    intersection), and $unionWith appends the requested seats' state."""
+    seat_ids = sorted({r["seat_id"] for r in rules})
+    match = {
+        "$or": [{"seat_id": {"$in": seat_ids}}, {"w3_id": w3_id}],
+        "start": {"$lte": max(r["end"] for r in rules)},
+        "end": {"$gte": min(r["start"] for r in rules)},
+        "weekdays": {"$in": sorted({d for r in rules for d in r["weekdays"]})},
+    }
+    if exclude:
+        match["_id"] = {"$nin": exclude}
+    return [
+        {"$match": match},
+        {"$project": {"seat_id": 1, "w3_id": 1, "start": 1, "end": 1, "weekdays": 1, "except": 1}},
+        {
+            "$unionWith": {
+                "coll": "seats",
+                "pipeline": [
+                    {"$match": {"_id": {"$in": seat_ids}}},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "seat_id": "$_id",
+                            "status": 1,
+                            "w3_id": "$booked_by",
+                            "live": {"$literal": True},
+                        }
+                    },
+                ],
+            }
+        },
+    ]
+
+
+def _reserved_on(at: datetime) -> dict:
+    return {"start": {"$lte": at}, "end": {"$gte": at}, "weekdays": at.weekday(), "except": {"$ne": at}}
+
+
+class MongoRepository(Repository):
+    def __init__(self, read: bool = False):
+        self.read = read
+        self._reader = None
+
+    def reader(self):
+        if self.read:
+            return self
+        if self._reader is None:
+            self._reader = MongoRepository(read=True)
+        return self._reader
+
+    @property
+    def seats(self):
+        return database.get_seats_read_collection() if self.read else database.get_seats_collection()
+
+    @property
+    def employees(self):
+        return database.get_employees_read_collection() if self.read else database.get_employees_collection()
+
+    @property
+    def reservations(self):
+        return database.get_reservations_collection()
+
+    async def ping(self):
+        await database.get_client().admin.command("ping")
+
+    async def ensure_indexes(self):
+        await self.reservations.create_index([("seat_id", 1), ("start", 1)])
+        await self.reservations.create_index([("w3_id", 1), ("start", 1)])
+        await concurrency.ensure_indexes(self.employees)
+
+    # SEATS
+    async def seed_seats(self, docs):
+        # find_one stops at the first document; count_documents would scan
+        if await self.seats.find_one({}, {"_id": 1}) is None:
+            try:
+                await self.seats.insert_many(docs, ordered=False)
+            except BulkWriteError:
+                # another worker seeded concurrently
+                pass
+
+    async def list_seats(self, limit=SEAT_LIST_LIMIT):
+        with tracing.span("mongo.seats.find"):
+            return await self.seats.find().sort("_id", 1).to_list(limit)
+
+    async def count_seats(self, status=None):
+        with tracing.span("mongo.seats.count_documents"):
+            return await self.seats.count_documents({"status": status} if status else {})
+
+    async def seat_counts(self):
+        pipeline = [
+            {
+                "$group": {
+                    "_id": {"floor": {"$ifNull": ["$floor", DEFAULT_FLOOR]}, "status": "$status"},
+                    "n": {"$sum": 1},
+                }
+            }
+        ]
+        per_floor = {}
+        with tracing.span("mongo.seats.aggregate"):
+            async for row in self.seats.aggregate(pipeline):
+                counts = per_floor.setdefault(row["_id"]["floor"], dict.fromkeys(STATUSES, 0))
+                counts[row["_id"]["status"]] = row["n"]
+        return per_floor
+
+    async def get_seat(self, seat_id):
+        with tracing.span("mongo.seats.find_one", seat_id=seat_id):
+            return await self.seats.find_one({"_id": seat_id})
+
+    async def claim_seat(self, seat, w3_id, now):
+        with tracing.span("mongo.seats.update_one", seat_id=seat["_id"]):
+            await concurrency.cas_update(
+                self.seats,
+                {"_id": seat["_id"], "status": "available"},
+                seat,
+                {"$set": {"status": "occupied", "booked_by": w3_id, "booking_time": now}},
+            )
+
+    async def unclaim_seat(self, seat_id, w3_id, version):
+        with tracing.span("mongo.seats.update_one", seat_id=seat_id, rollback=True):
+            await self.seats.update_one(
+                {"_id": seat_id, "booked_by": w3_id, "version": version},
+                {"$set": _free(), "$inc": {"version": 1}},
+            )
+
+    async def free_seat(self, seat, w3_id):
+        with tracing.span("mongo.seats.update_one", seat_id=seat["_id"]):
+            await concurrency.cas_update(self.seats, {"_id": seat["_id"], "booked_by": w3_id}, seat, {"$set": _free()})
+
+    async def occupied_batches(self, criteria, batch_size):
+        cursor = self.seats.find(
+            {**seat_query(criteria), "status": "occupied"}, {"_id": 1, "booked_by": 1}, batch_size=batch_size
+        )
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def release_seats(self, seats):
+        with tracing.span("mongo.seats.update_many", seats=len(seats)):
+            result = await self.seats.update_many(
+                {"status": "occupied", "$or": [{"_id": s["_id"], "booked_by": s["booked_by"]} for s in seats]},
+                {"$set": _free(), "$inc": {"version": 1}},
+            )
+        return result.modified_count
+
+    async def reprice_seats(self, criteria, price):
+        query = seat_query(criteria)
+        with tracing.span("mongo.seats.count_documents"):
+            matched = await self.seats.count_documents(query)
+        with tracing.span("mongo.seats.update_many"):
+            result = await self.seats.update_many(
+                {**query, "price": {"$ne": price}}, {"$set": {"price": price}, "$inc": {"version": 1}}
+            )
+        return matched, result.modified_count
+
+    # EMPLOYEES
+    async def get_employee(self, w3_id):
+        with tracing.span("mongo.employees.find_one"):
+            return await self.employees.find_one({"w3_id": w3_id})
+
+    async def list_employees(self):
+        return await self.employees.find().to_list(None)
+
+    async def seated_employees(self, w3_ids):
+        cursor = self.employees.find(
+            {"w3_id": {"$in": w3_ids}, "last_booked_seat": {"$ne": None}},
+            {"_id": 0, "w3_id": 1, "last_booked_seat": 1},
+        )
+        with tracing.span("mongo.employees.find"):
+            return await cursor.to_list(None)
+
+    async def login_employee(self, w3_id, claims):
+        with tracing.span("mongo.employees.upsert"):
+            employee = await self.employees.find_one({"w3_id": w3_id})
+            if not employee:
+                await self.employees.insert_one(employee_document(claims))
+            else:
+                await self.employees.update_one(
+                    {"w3_id": w3_id},
+                    {"$set": {"last_login_at": datetime.utcnow()}},
+                )
+
+    async def record_booking(self, employee, w3_id, seat_id, cost, now):
+        with tracing.span("mongo.employees.update_one"):
+            await concurrency.cas_update(
+                self.employees,
+                {"w3_id": w3_id},
+                employee,
+                {
+                    "$addToSet": {"booked_seats": seat_id},
+                    "$inc": {"blue_tokens_spent": cost},
+                    "$set": {"last_booking_at": now, "last_booked_seat": seat_id},
+                },
+                # only a first booking may create the employee; otherwise a
+                # moved version would insert a duplicate instead of conflicting
+                upsert=employee is None,
+            )
+
+    def _refund_update(self, seat_id, cost):
+        return {
+            "$inc": {**_refund(cost), "version": 1},
+            "$pull": {"booked_seats": seat_id},
+            "$set": {"last_booked_seat": None, "last_booking_at": None},
+        }
+
+    async def refund_booking(self, w3_id, seat_id, cost):
+        with tracing.span("mongo.employees.update_one"):
+            result = await self.employees.update_one(
+                {"w3_id": w3_id, "booked_seats": seat_id}, self._refund_update(seat_id, cost)
+            )
+        return result.modified_count == 1
+
+    async def refund_bookings(self, seats, cost):
+        refunds = [
+            UpdateOne({"w3_id": s["booked_by"], "booked_seats": s["_id"]}, self._refund_update(s["_id"], cost))
+            for s in seats
+            if s.get("booked_by")
+        ]
+        if not refunds:
+            return 0
+        with tracing.span("mongo.employees.bulk_write", ops=len(refunds)):
+            return (await self.employees.bulk_write(refunds, ordered=False)).modified_count
+
+    # RESERVATIONS
+    async def reservation_candidates(self, rules, w3_id, exclude=None):
+        with tracing.span("mongo.reservations.aggregate", rules=len(rules)):
+            return await self.reservations.aggregate(conflict_pipeline(rules, w3_id, exclude)).to_list(None)
+
+    async def insert_reservations(self, rules):
+        with tracing.span("mongo.reservations.insert_many", rules=len(rules)):
+            return list((await self.reservations.insert_many(rules)).inserted_ids)
+
+    async def delete_reservations(self, ids):
+        with tracing.span("mongo.reservations.delete_many", rules=len(ids)):
+            await self.reservations.delete_many({"_id": {"$in": ids}})
+
+    async def list_reservations(self, w3_id, first, last):
+        query = {"w3_id": w3_id, "start": {"$lte": last}, "end": {"$gte": first}}
+        with tracing.span("mongo.reservations.find"):
+            return await self.reservations.find(query).sort("start", 1).to_list(None)
+
+    async def reserved_seat_ids(self, at):
+        with tracing.span("mongo.reservations.distinct"):
+            return sorted(await self.reservations.distinct("seat_id", _reserved_on(at)))
+
+    async def reserved_by_other(self, seat_id, w3_id, at):
+        query = {"seat_id": seat_id, "w3_id": {"$ne": w3_id}, **_reserved_on(at)}
+        with tracing.span("mongo.reservations.find_one", seat_id=seat_id):
+            return await self.reservations.find_one(query, {"_id": 1}) is not None
+
+    async def cancel_reservation(self, reservation_id, w3_id):
+        with tracing.span("mongo.reservations.delete_one"):
+            result = await self.reservations.delete_one({"_id": reservation_id, "w3_id": w3_id})
+        return result.deleted_count == 1
+
+
+# MEMORY
+_NO_VERSION = object()
+
+
+def _version(doc):
+    return _NO_VERSION if doc is None else doc.get("version", _NO_VERSION)
+
+
+def _matches(seat: dict, criteria: dict) -> bool:
+    if criteria.get("floor") is not None and seat.get("floor") != criteria["floor"]:
+        return False
+    if criteria.get("zone") is not None and seat.get("zone") != criteria["zone"]:
+        return False
+    if criteria.get("booked_before") is not None:
+        booked_at = seat.get("booking_time")
+        if booked_at is None or not booked_at < criteria["booked_before"]:
+            return False
+    return True
+
+
+def _covers(rule: dict, at: datetime) -> bool:
+    return rule["start"] <= at <= rule["end"] and at.weekday() in rule["weekdays"] and at not in rule.get("except", ())
+
+
+class InMemoryRepository(Repository):
+    """Dicts of documents. Every method yields to the loop (and waits
+    ``latency`` seconds, to stand in for a round trip) before doing its work
+    in one step, which is what makes each operation atomic."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.seats: Dict[int, dict] = {}
+        self.employees: Dict[str, dict] = {}
+        self.reservations: Dict[ObjectId, dict] = {}
+
+    async def _round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    # SEATS
+    async def seed_seats(self, docs):
+        await self._round_trip()
+        if not self.seats:
+            for doc in docs:
+                self.seats[doc["_id"]] = copy.deepcopy(doc)
+
+    async def list_seats(self, limit=SEAT_LIST_LIMIT):
+        await self._round_trip()
+        return [dict(self.seats[i]) for i in sorted(self.seats)[:limit]]
+
+    async def count_seats(self, status=None):
+        await self._round_trip()
+        return sum(1 for s in self.seats.values() if not status or s["status"] == status)
+
+    async def seat_counts(self):
+        await self._round_trip()
+        per_floor = {}
+        for seat in self.seats.values():
+            counts = per_floor.setdefault(seat.get("floor", DEFAULT_FLOOR), dict.fromkeys(STATUSES, 0))
+            counts[seat["status"]] = counts.get(seat["status"], 0) + 1
+        return per_floor
+
+    async def get_seat(self, seat_id):
+        await self._round_trip()
+        seat = self.seats.get(seat_id)
+        return dict(seat) if seat is not None else None
+
+    def _bump(self, doc: dict, **fields):
+        doc.update(fields)
+        doc["version"] = doc.get("version", 0) + 1
+
+    async def claim_seat(self, seat, w3_id, now):
+        await self._round_trip()
+        current = self.seats.get(seat["_id"])
+        if current is None or current["status"] != "available" or _version(current) != _version(seat):
+            raise Conflict()
+        self._bump(current, status="occupied", booked_by=w3_id, booking_time=now)
+
+    async def unclaim_seat(self, seat_id, w3_id, version):
+        await self._round_trip()
+        current = self.seats.get(seat_id)
+        if current is not None and current.get("booked_by") == w3_id and current.get("version") == version:
+            self._bump(current, **_free())
+
+    async def free_seat(self, seat, w3_id):
+        await self._round_trip()
+        current = self.seats.get(seat["_id"])
+        if current is None or current.get("booked_by") != w3_id or _version(current) != _version(seat):
+            raise Conflict()
+        self._bump(current, **_free())
+
+    async def occupied_batches(self, criteria, batch_size):
+        await self._round_trip()
+        matching = [
+            {"_id": s["_id"], "booked_by": s.get("booked_by")}
+            for s in self.seats.values()
+            if s["status"] == "occupied" and _matches(s, criteria)
+        ]
+        for i in range(0, len(matching), batch_size):
+            yield matching[i:i + batch_size]
+            await self._round_trip()
+
+    async def release_seats(self, seats):
+        await self._round_trip()
+        released = 0
+        for s in seats:
+            current = self.seats.get(s["_id"])
+            if current is not None and current["status"] == "occupied" and current.get("booked_by") == s["booked_by"]:
+                self._bump(current, **_free())
+                released += 1
+        return released
+
+    async def reprice_seats(self, criteria, price):
+        await self._round_trip()
+        matched = [s for s in self.seats.values() if _matches(s, criteria)]
+        changed = [s for s in matched if s.get("price") != price]
+        for seat in changed:
+            self._bump(seat, price=price)
+        return len(matched), len(changed)
+
+    # EMPLOYEES
+    async def get_employee(self, w3_id):
+        await self._round_trip()
+        employee = self.employees.get(w3_id)
+        return copy.deepcopy(employee) if employee is not None else None
+
+    async def list_employees(self):
+        await self._round_trip()
+        return copy.deepcopy(list(self.employees.values()))
+
+    async def seated_employees(self, w3_ids):
+        await self._round_trip()
+        return [
+            {"w3_id": e["w3_id"], "last_booked_seat": e["last_booked_seat"]}
+            for w3_id in w3_ids
+            if (e := self.employees.get(w3_id)) is not None and e.get("last_booked_seat") is not None
+        ]
+
+    async def login_employee(self, w3_id, claims):
+        await self._round_trip()
+        if w3_id in self.employees:
+            self.employees[w3_id]["last_login_at"] = datetime.utcnow()
+        else:
+            self.employees[w3_id] = employee_document(claims)
+
+    async def record_booking(self, employee, w3_id, seat_id, cost, now):
+        await self._round_trip()
+        current = self.employees.get(w3_id)
+        if current is None:
+            current = self.employees[w3_id] = {"w3_id": w3_id, "booked_seats": [], "blue_tokens_spent": 0}
+        elif _version(current) != _version(employee):
+            raise Conflict()
+        if seat_id not in current.setdefault("booked_seats", []):
+            current["booked_seats"].append(seat_id)
+        self._bump(
+            current,
+            blue_tokens_spent=current.get("blue_tokens_spent", 0) + cost,
+            last_booking_at=now,
+            last_booked_seat=seat_id,
+        )
+
+    def _refund(self, w3_id, seat_id, cost) -> bool:
+        current = self.employees.get(w3_id)
+        if current is None or seat_id not in current.get("booked_seats", ()):
+            return False
+        current["booked_seats"] = [s for s in current["booked_seats"] if s != seat_id]
+        self._bump(
+            current,
+            blue_tokens_spent=current.get("blue_tokens_spent", 0) - cost,
+            last_booked_seat=None,
+            last_booking_at=None,
+        )
+        return True
+
+    async def refund_booking(self, w3_id, seat_id, cost):
+        await self._round_trip()
+        return self._refund(w3_id, seat_id, cost)
+
+    async def refund_bookings(self, seats, cost):
+        await self._round_trip()
+        return sum(self._refund(s["booked_by"], s["_id"], cost) for s in seats if s.get("booked_by"))
+
+    # RESERVATIONS
+    async def reservation_candidates(self, rules, w3_id, exclude=None):
+        await self._round_trip()
+        seat_ids = {r["seat_id"] for r in rules}
+        first, last = min(r["start"] for r in rules), max(r["end"] for r in rules)
+        weekdays = {d for r in rules for d in r["weekdays"]}
+        excluded = set(exclude or ())
+        found = [
+            copy.deepcopy(r)
+            for r in self.reservations.values()
+            if (r["seat_id"] in seat_ids or r["w3_id"] == w3_id)
+            and r["start"] <= last
+            and r["end"] >= first
+            and weekdays & set(r["weekdays"])
+            and r["_id"] not in excluded
+        ]
+        live = [
+            {"seat_id": s["_id"], "status": s["status"], "w3_id": s.get("booked_by"), "live": True}
+            for seat_id in sorted(seat_ids)
+            if (s := self.seats.get(seat_id)) is not None
+        ]
+        return found + live
+
+    async def insert_reservations(self, rules):
+        await self._round_trip()
+        for rule in rules:
+            rule.setdefault("_id", ObjectId())
+            self.reservations[rule["_id"]] = copy.deepcopy(rule)
+        return [rule["_id"] for rule in rules]
+
+    async def delete_reservations(self, ids):
+        await self._round_trip()
+        for rid in ids:
+            self.reservations.pop(rid, None)
+
+    async def list_reservations(self, w3_id, first, last):
+        await self._round_trip()
+        found = [
+            copy.deepcopy(r)
+            for r in self.reservations.values()
+            if r["w3_id"] == w3_id and r["start"] <= last and r["end"] >= first
+        ]
+        return sorted(found, key=lambda r: r["start"])
+
+    async def reserved_seat_ids(self, at):
+        await self._round_trip()
+        return sorted({r["seat_id"] for r in self.reservations.values() if _covers(r, at)})
+
+    async def reserved_by_other(self, seat_id, w3_id, at):
+        await self._round_trip()
+        return any(
+            r["seat_id"] == seat_id and r["w3_id"] != w3_id and _covers(r, at) for r in self.reservations.values()
+        )
+
+    async def cancel_reservation(self, reservation_id, w3_id):
+        await self._round_trip()
+        rule = self.reservations.get(reservation_id)
+        if rule is None or rule["w3_id"] != w3_id:
+            return False
+        del self.reservations[reservation_id]
+        return True
+
+
+# REPOSITORY
+_repository: Optional[Repository] = None
+
+
+def create_repository(backend: str = STORAGE_BACKEND) -> Repository:
+    global _repository
+    _repository = InMemoryRepository() if backend == "memory" else MongoRepository()
+    return _repository
+
+
+def get_repository() -> Repository:
+    return _repository if _repository is not None else create_repository()
+
+
+# Read-only routes (seat map polling) can scale out over replicas.
+def get_read_repository() -> Repository:
+    return get_repository().reader()
@@ -1,6 +1,9 @@
 # schemas.py
 from datetime import datetime
 
+# Blue tokens charged per booking and refunded on release
+SEAT_COST = 5
+
 def employee_document(claims: dict):
     return {
         "w3_id": claims.get("uid") or claims.get("preferred_username"),
@@ -15,4 +18,20 @@ def employee_document(claims: dict):
         "blue_tokens_spent": 0, 
 
         "booked_seats": [],
-    }
\ No newline at end of file
+
+        # bumped by every booking-state write (see concurrency.py)
+        "version": 0,
+    }
+
+
+def me_response(user: dict, employee: dict = None):
+    """GET /me. The first three fields are the signed-in user's claims, as
+    before; ``blue_tokens_spent`` and ``last_booked_seat`` were added for
+    the booking UI and are 0 / None until the first booking."""
+    return {
+        "w3_id": user["w3_id"],
+        "name": user.get("name"),
+        "email": user.get("email"),
+        "blue_tokens_spent": (employee or {}).get("blue_tokens_spent", 0),
+        "last_booked_seat": (employee or {}).get("last_booked_seat"),
+    }
@@ -0,0 +1,121 @@
+# seat_index.py
+# Uniform grid over seat coordinates for nearest-free-seat queries.
+import heapq
+import math
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+DEFAULT_CELL_SIZE = 4.0
+
+
+class GridIndex:
+    """Buckets rows into square cells keyed by (floor, cell_x, cell_y).
+
+    Adding or removing a row touches one bucket, so the index is kept up to
+    date on every book/release instead of being rebuilt. ``nearest`` walks
+    rings of cells outwards from the query point and stops as soon as no
+    unvisited cell can hold anything closer than the k-th best hit. Rings
+    are clipped to the occupied bounds, so a query point far outside them
+    costs no more than one inside.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int, int], Set[int]] = {}
+        self._where: Dict[int, Tuple[Tuple[int, int, int], float, float]] = {}
+        self._floors: Dict[int, int] = {}
+        # Cell bounds ever used; only grows, which just means a few empty
+        # rings may be visited after seats are removed.
+        self._bounds: Optional[List[int]] = None
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, row: int):
+        return row in self._where
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def add(self, row: int, floor: int, x: float, y: float):
+        self.remove(row)
+        cx, cy = self._cell(x), self._cell(y)
+        key = (floor, cx, cy)
+        self._cells.setdefault(key, set()).add(row)
+        self._where[row] = (key, x, y)
+        self._floors[floor] = self._floors.get(floor, 0) + 1
+        if self._bounds is None:
+            self._bounds = [cx, cx, cy, cy]
+        else:
+            b = self._bounds
+            b[0], b[1], b[2], b[3] = min(b[0], cx), max(b[1], cx), min(b[2], cy), max(b[3], cy)
+
+    def remove(self, row: int):
+        entry = self._where.pop(row, None)
+        if entry is None:
+            return
+        key = entry[0]
+        bucket = self._cells[key]
+        bucket.discard(row)
+        if not bucket:
+            del self._cells[key]
+        self._floors[key[0]] -= 1
+        if not self._floors[key[0]]:
+            del self._floors[key[0]]
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        k: int,
+        floor: Optional[int] = None,
+        accept: Optional[Callable[[int], bool]] = None,
+    ) -> List[Tuple[float, int]]:
+        """Return up to ``k`` (distance, row) pairs ordered by distance."""
+        if k <= 0 or self._bounds is None:
+            return []
+        floors = [floor] if floor is not None else list(self._floors)
+        floors = [f for f in floors if f in self._floors]
+        if not floors:
+            return []
+
+        cx0, cy0 = self._cell(x), self._cell(y)
+        min_cx, max_cx, min_cy, max_cy = self._bounds
+        # rings before the first one to reach the bounds are empty
+        first_ring = max(min_cx - cx0, cx0 - max_cx, min_cy - cy0, cy0 - max_cy, 0)
+        max_ring = max(cx0 - min_cx, max_cx - cx0, cy0 - min_cy, max_cy - cy0, 0)
+
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, row)
+        for ring in range(first_ring, max_ring + 1):
+            for cx, cy in _ring_cells(cx0, cy0, ring, self._bounds):
+                for f in floors:
+                    for row in self._cells.get((f, cx, cy), ()):
+                        if accept is not None and not accept(row):
+                            continue
+                        _, px, py = self._where[row]
+                        d = math.hypot(px - x, py - y)
+                        if len(best) < k:
+                            heapq.heappush(best, (-d, row))
+                        elif d < -best[0][0]:
+                            heapq.heapreplace(best, (-d, row))
+            # Anything in ring+1 or beyond is at least this far away.
+            if len(best) == k and -best[0][0] <= ring * self.cell_size:
+                break
+        return sorted((-d, row) for d, row in best)
+
+
+def _ring_cells(cx: int, cy: int, ring: int, bounds: List[int]):
+    """Cells at Chebyshev distance ``ring`` from (cx, cy) inside ``bounds``."""
+    min_cx, max_cx, min_cy, max_cy = bounds
+    if ring == 0:
+        yield cx, cy
+        return
+    xs = range(max(cx - ring, min_cx), min(cx + ring, max_cx) + 1)
+    for y in {cy - ring, cy + ring}:
+        if min_cy <= y <= max_cy:
+            for x in xs:
+                yield x, y
+    ys = range(max(cy - ring + 1, min_cy), min(cy + ring - 1, max_cy) + 1)
+    for x in {cx - ring, cx + ring}:
+        if min_cx <= x <= max_cx:
+            for y in ys:
+                yield x, y
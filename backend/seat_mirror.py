@@ -0,0 +1,226 @@
+# seat_mirror.py
+# Keeps an in-memory SeatTable in step with the seats collection.
+import asyncio
+import fcntl
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+
+from bson import json_util
+from pymongo.errors import OperationFailure, PyMongoError
+
+from seat_table import SeatTable, docs_from_columns
+
+logger = logging.getLogger(__name__)
+
+# ENV
+SEAT_MIRROR_ENABLED = os.getenv("SEAT_MIRROR_ENABLED", "true").lower() == "true"
+SEAT_MIRROR_STATE_PATH = os.getenv("SEAT_MIRROR_STATE_PATH", "/tmp/seat_mirror.json")
+SEAT_MIRROR_SYNC_SECONDS = float(os.getenv("SEAT_MIRROR_SYNC_SECONDS", "2"))
+SEAT_MIRROR_CHECKPOINT_SECONDS = float(os.getenv("SEAT_MIRROR_CHECKPOINT_SECONDS", "5"))
+
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# how long to wait before resyncing after the stream failed
+RETRY_SECONDS = 1
+# The stored resume token is no longer in the oplog.
+RESUME_FAILED_CODES = (260, 280, 286)
+
+
+class SeatMirror:
+    """Tails the seats change stream into a SeatTable.
+
+    The table and the resume token of the last applied event are
+    checkpointed together to ``state_path``; after a restart the mirror
+    loads the checkpoint and resumes the stream from that token instead of
+    rereading the collection. Every worker follows the same stream, so they
+    share one checkpoint file, written and read under a lock; any worker's
+    table and token are a consistent pair to resume from. The checkpoint
+    only helps if ``state_path`` outlives the process (on OpenShift, an
+    emptyDir: container restarts resume, a new pod does a full sync).
+    Deployments without a replica set get a periodic full sync instead.
+    """
+
+    def __init__(self, collection, table: Optional[SeatTable] = None, state_path: str = SEAT_MIRROR_STATE_PATH):
+        self.collection = collection
+        self.table = table if table is not None else SeatTable()
+        self.state_path = state_path
+        self.ready = False
+        self.mode = "starting"
+        self.synced_at: Optional[datetime] = None
+        self._resume_token = None
+        self._checkpointed_version = -1
+        self._task: Optional[asyncio.Task] = None
+
+    # LIFECYCLE
+    async def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.mode == "changestream":
+            await self.checkpoint()
+
+    async def run(self):
+        await self.restore()
+        while True:
+            try:
+                await self._tail()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable; seat mirror polls every %ss", SEAT_MIRROR_SYNC_SECONDS)
+                    await self._poll()
+                    return
+                if e.code in RESUME_FAILED_CODES:
+                    logger.warning("Seat mirror resume token expired; reloading")
+                    self._resume_token = None
+                else:
+                    logger.warning("Seat mirror stream failed (%s); retrying", e)
+            except PyMongoError as e:
+                logger.warning("Seat mirror stream interrupted (%s); retrying", e)
+            except Exception:
+                # Anything else (a document the table cannot hold, a bug)
+                # must not leave /seats serving a table that stopped moving.
+                logger.exception("Seat mirror failed; reloading")
+                self._resume_token = None
+            self.ready = False
+            await asyncio.sleep(RETRY_SECONDS)
+
+    # CHANGE STREAM
+    async def _tail(self):
+        async with self.collection.watch(
+            full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            self.mode = "changestream"
+            if self._resume_token is None:
+                # Stream is open before the reload, so nothing written during
+                # the reload is missed; replaying it is harmless.
+                await self.full_sync()
+                self._resume_token = stream.resume_token
+            last_checkpoint = time.monotonic()
+            while True:
+                self._mark_synced()
+                change = await stream.try_next()
+                if change is not None:
+                    self.apply(change)
+                self._resume_token = stream.resume_token
+                if time.monotonic() - last_checkpoint >= SEAT_MIRROR_CHECKPOINT_SECONDS:
+                    await self.checkpoint()
+                    last_checkpoint = time.monotonic()
+
+    def apply(self, change: dict):
+        op = change.get("operationType")
+        if op in ("insert", "replace", "update"):
+            doc = change.get("fullDocument")
+            if doc is None:
+                # deleted again before the lookup ran
+                self.table.delete(change["documentKey"]["_id"])
+            else:
+                self.table.upsert(doc)
+        elif op == "delete":
+            self.table.delete(change["documentKey"]["_id"])
+        elif op in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.table.clear()
+            self.ready = False
+            self._resume_token = None
+            raise PyMongoError(f"seats collection {op}")
+
+    # FALLBACK
+    async def _poll(self):
+        self.mode = "polling"
+        while True:
+            try:
+                await self.full_sync()
+                self._mark_synced()
+            except PyMongoError as e:
+                logger.warning("Seat mirror sync failed (%s)", e)
+                self.ready = False
+            except Exception:
+                logger.exception("Seat mirror sync failed")
+                self.ready = False
+            await asyncio.sleep(SEAT_MIRROR_SYNC_SECONDS)
+
+    async def full_sync(self):
+        docs = await self.collection.find().to_list(None)
+        self.table.load(docs)
+
+    def _mark_synced(self):
+        self.synced_at = datetime.utcnow()
+        self.ready = True
+
+    # WRITE-THROUGH
+    def apply_local(self, seat_id: int, **fields):
+        """Reflect a write this process just made without waiting for the stream."""
+        if self.ready:
+            self.table.update(seat_id, **fields)
+
+    # CHECKPOINT
+    async def checkpoint(self):
+        if self._resume_token is None or self.table.version == self._checkpointed_version:
+            return
+        # Only the array copies happen on the loop; encoding and writing
+        # tens of thousands of seats runs in a thread.
+        version = self.table.version
+        token, columns = self._resume_token, self.table.columns()
+        try:
+            await asyncio.to_thread(_write_checkpoint, self.state_path, token, columns)
+            self._checkpointed_version = version
+        except OSError as e:
+            logger.warning("Could not write seat mirror checkpoint (%s)", e)
+
+    async def restore(self):
+        try:
+            state = await asyncio.to_thread(_read_checkpoint, self.state_path)
+        except (OSError, ValueError):
+            return
+        self.table.load(state.get("seats", []))
+        self._resume_token = state.get("resume_token")
+        self._checkpointed_version = self.table.version
+
+
+def _lock(state_path: str, mode: int):
+    f = open(state_path + ".lock", "a")
+    fcntl.flock(f, mode)
+    return f
+
+
+def _write_checkpoint(state_path: str, token, columns: dict):
+    data = json_util.dumps({"resume_token": token, "seats": docs_from_columns(columns)})
+    with _lock(state_path, fcntl.LOCK_EX):
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(state_path) or ".", prefix=os.path.basename(state_path), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, state_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _read_checkpoint(state_path: str) -> dict:
+    with _lock(state_path, fcntl.LOCK_SH):
+        with open(state_path) as f:
+            return json_util.loads(f.read())
+
+
+# MIRROR
+_mirror: Optional[SeatMirror] = None
+
+
+def create_mirror(collection) -> Optional[SeatMirror]:
+    global _mirror
+    _mirror = SeatMirror(collection) if SEAT_MIRROR_ENABLED else None
+    return _mirror
+
+
+def get_mirror() -> Optional[SeatMirror]:
+    return _mirror
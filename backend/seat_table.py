@@ -0,0 +1,239 @@
+# seat_table.py
+# In-memory seat state, kept as compact parallel arrays indexed by row number.
+import logging
+from array import array
+from typing import Dict, List, Optional
+
+from seat_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOOR = 1
+
+# Status codes stored in SeatTable.status. 0 marks a deleted row.
+STATUSES = ("available", "occupied")
+_CODE = {name: code for code, name in enumerate(STATUSES, start=1)}
+_NAME = {code: name for name, code in _CODE.items()}
+
+
+def _code(seat_id: int, status: str) -> int:
+    """Status code for ``status``; 0 (left out, like a deleted seat) for one
+    this table does not know, so a new status cannot break the mirror."""
+    code = _CODE.get(status)
+    if code is None:
+        logger.warning("Seat %s has unknown status %r; leaving it out", seat_id, status)
+        return 0
+    return code
+
+
+def _iter_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class SeatTable:
+    """Array-backed seat store with per-floor status bitsets.
+
+    Each seat owns one row in the parallel arrays. For every (floor, status)
+    pair a Python int is used as a bitset of rows, so a booking or release
+    is a couple of bit flips and counting free seats on a floor is a
+    popcount. Rows are never removed; a deleted seat just clears its bits.
+    ``version`` increases on every change.
+
+    Available seats that have x/y coordinates are also kept in ``grid`` for
+    nearest-free-seat searches.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = array("q")
+        self.price = array("q")
+        self.floor = array("q")
+        self.x = array("d")
+        self.y = array("d")
+        self.has_position = bytearray()
+        self.zone: List[Optional[str]] = []
+        self.status = bytearray()
+        self.booked_by: List[Optional[str]] = []
+        self.grid = GridIndex()
+        self._row: Dict[int, int] = {}
+        # floor -> status code -> bitset of rows
+        self._bits: Dict[int, Dict[int, int]] = {}
+        # keeps counting across clear() so a version is never reused
+        self.version = getattr(self, "version", 0) + 1
+
+    def __len__(self):
+        return sum(self.count(status) for status in STATUSES)
+
+    def load(self, docs):
+        self.clear()
+        for doc in sorted(docs, key=lambda d: d["_id"]):
+            self.upsert(doc)
+
+    def upsert(self, doc: dict):
+        seat_id = doc["_id"]
+        row = self._row.get(seat_id)
+        if row is None:
+            row = len(self.ids)
+            self._row[seat_id] = row
+            self.ids.append(seat_id)
+            self.price.append(0)
+            self.floor.append(doc.get("floor", DEFAULT_FLOOR))
+            self.x.append(0.0)
+            self.y.append(0.0)
+            self.has_position.append(0)
+            self.zone.append(None)
+            self.status.append(0)
+            self.booked_by.append(None)
+        self._set_status(row, 0)
+        self.floor[row] = doc.get("floor", DEFAULT_FLOOR)
+        has_position = doc.get("x") is not None and doc.get("y") is not None
+        self.has_position[row] = has_position
+        self.x[row] = doc["x"] if has_position else 0.0
+        self.y[row] = doc["y"] if has_position else 0.0
+        self.zone[row] = doc.get("zone")
+        self.price[row] = doc.get("price", 0)
+        self.booked_by[row] = doc.get("booked_by")
+        self._set_status(row, _code(seat_id, doc.get("status", "available")))
+        self.version += 1
+
+    def update(self, seat_id: int, **fields):
+        """Apply a partial update to a seat already in the table."""
+        row = self._row.get(seat_id)
+        if row is None or not self.status[row]:
+            return False
+        if "price" in fields:
+            self.price[row] = fields["price"]
+        if "booked_by" in fields:
+            self.booked_by[row] = fields["booked_by"]
+        if "status" in fields:
+            self._set_status(row, _code(seat_id, fields["status"]))
+        self.version += 1
+        return True
+
+    def delete(self, seat_id: int):
+        row = self._row.get(seat_id)
+        if row is None:
+            return
+        self._set_status(row, 0)
+        self.version += 1
+
+    def _set_status(self, row: int, code: int):
+        old = self.status[row]
+        if old == code:
+            return
+        bits = self._bits.setdefault(self.floor[row], {})
+        mask = 1 << row
+        if old:
+            bits[old] &= ~mask
+        if code:
+            bits[code] = bits.get(code, 0) | mask
+        self.status[row] = code
+        if code == _CODE["available"] and self.has_position[row]:
+            self.grid.add(row, self.floor[row], self.x[row], self.y[row])
+        else:
+            self.grid.remove(row)
+
+    def _status_bits(self, status: Optional[str], floor: Optional[int] = None) -> int:
+        floors = self._bits.values() if floor is None else [self._bits.get(floor, {})]
+        codes = _NAME if status is None else (_CODE[status],)
+        result = 0
+        for bits in floors:
+            for code in codes:
+                result |= bits.get(code, 0)
+        return result
+
+    def get(self, seat_id: int) -> Optional[dict]:
+        row = self._row.get(seat_id)
+        if row is None or not self.status[row]:
+            return None
+        return self._doc(row)
+
+    def _doc(self, row: int) -> dict:
+        return {
+            "_id": self.ids[row],
+            "status": _NAME[self.status[row]],
+            "price": self.price[row],
+            "booked_by": self.booked_by[row],
+            "floor": self.floor[row],
+            "x": self.x[row] if self.has_position[row] else None,
+            "y": self.y[row] if self.has_position[row] else None,
+            "zone": self.zone[row],
+        }
+
+    def rows(self, status: Optional[str] = None, floor: Optional[int] = None) -> List[dict]:
+        return [self._doc(row) for row in _iter_bits(self._status_bits(status, floor))]
+
+    def count(self, status: Optional[str] = None, floor: Optional[int] = None) -> int:
+        return self._status_bits(status, floor).bit_count()
+
+    def first(self, status: str, floor: Optional[int] = None) -> Optional[dict]:
+        """Lowest-numbered row with ``status`` (e.g. the first free seat)."""
+        bits = self._status_bits(status, floor)
+        if not bits:
+            return None
+        return self._doc((bits & -bits).bit_length() - 1)
+
+    def position(self, seat_id: int):
+        """(floor, x, y) of a seat, or None if it has no coordinates."""
+        row = self._row.get(seat_id)
+        if row is None or not self.status[row] or not self.has_position[row]:
+            return None
+        return self.floor[row], self.x[row], self.y[row]
+
+    def nearest_available(
+        self, x: float, y: float, k: int, floor: Optional[int] = None, zone: Optional[str] = None
+    ) -> List[dict]:
+        accept = None if zone is None else (lambda row: self.zone[row] == zone)
+        hits = self.grid.nearest(x, y, k, floor=floor, accept=accept)
+        return [{**self._doc(row), "distance": round(d, 3)} for d, row in hits]
+
+    def floors(self) -> List[int]:
+        return sorted(floor for floor, bits in self._bits.items() if any(bits.values()))
+
+    def summary(self) -> Dict[int, Dict[str, int]]:
+        return {
+            floor: {status: self.count(status, floor) for status in STATUSES}
+            for floor in self.floors()
+        }
+
+    def snapshot(self) -> List[dict]:
+        return self.rows()
+
+    def columns(self) -> dict:
+        """Copies of the arrays: cheap to take on the event loop, and turned
+        into documents by ``docs_from_columns`` anywhere else."""
+        return {
+            "ids": self.ids[:],
+            "status": bytes(self.status),
+            "price": self.price[:],
+            "booked_by": list(self.booked_by),
+            "floor": self.floor[:],
+            "x": self.x[:],
+            "y": self.y[:],
+            "has_position": bytes(self.has_position),
+            "zone": list(self.zone),
+        }
+
+
+def docs_from_columns(columns: dict) -> List[dict]:
+    """What ``SeatTable.snapshot`` returns, from ``SeatTable.columns``."""
+    c = columns
+    return [
+        {
+            "_id": c["ids"][row],
+            "status": _NAME[code],
+            "price": c["price"][row],
+            "booked_by": c["booked_by"][row],
+            "floor": c["floor"][row],
+            "x": c["x"][row] if c["has_position"][row] else None,
+            "y": c["y"][row] if c["has_position"][row] else None,
+            "zone": c["zone"][row],
+        }
+        for row, code in enumerate(c["status"])
+        if code
+    ]
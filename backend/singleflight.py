@@ -0,0 +1,38 @@
+# singleflight.py
+# Coalesces concurrent identical reads onto one in-flight call.
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    Callers that ask for a key while a call for it is in flight wait for
+    that call and all receive the same result (or exception), so a burst
+    of identical reads costs one round trip. The shared call runs as its
+    own task: a caller that is cancelled does not cancel it for the rest.
+    Results are shared objects and must not be mutated by callers.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every caller went away
+            task.exception()
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import admin
+import repository
+from auth import get_current_user
+from main import app
+from repository import InMemoryRepository
+from schemas import SEAT_COST
+
+
+class RecordingRepository(InMemoryRepository):
+    """Counts writes per batch and how many overlap."""
+
+    def __init__(self):
+        super().__init__(latency=0.001)
+        self.releases = []
+        self.refunds = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def release_seats(self, seats):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.releases.append(seats)
+            return await super().release_seats(seats)
+        finally:
+            self.in_flight -= 1
+
+    async def refund_bookings(self, seats, cost):
+        self.refunds.append(seats)
+        return await super().refund_bookings(seats, cost)
+
+
+def test_filter_needs_at_least_one_criterion():
+    assert admin.SeatFilter(floor=2, zone="A").criteria() == {"floor": 2, "zone": "A"}
+    cutoff = datetime(2026, 1, 1)
+    assert admin.SeatFilter(booked_before=cutoff).criteria() == {"booked_before": cutoff}
+    assert repository.seat_query({"booked_before": cutoff}) == {"booking_time": {"$lt": cutoff}}
+    with pytest.raises(HTTPException):
+        admin.SeatFilter().criteria()
+
+
+def test_release_streams_in_batches_with_one_write_of_each_kind_per_batch():
+    repo = RecordingRepository()
+    for i in range(1, 2601):
+        repo.seats[i] = {"_id": i, "status": "occupied", "booked_by": f"user{i}", "floor": 1 if i <= 2500 else 2}
+        repo.employees[f"user{i}"] = {"w3_id": f"user{i}", "booked_seats": [i], "blue_tokens_spent": SEAT_COST}
+    # rebooked by someone else since: released, but the old holder is not refunded
+    repo.employees["user1"]["booked_seats"] = []
+    totals = asyncio.run(admin.release_matching(repo, {"floor": 1}, batch_size=1000))
+    assert totals == {"matched": 2500, "released": 2500, "refunded": 2499, "batches": 3}
+    assert [len(b) for b in repo.releases] == [1000, 1000, 500]
+    assert [len(b) for b in repo.refunds] == [1000, 1000, 500]
+    assert repo.max_in_flight == 1
+    assert repo.seats[2600]["status"] == "occupied"
+    assert repo.employees["user2"]["blue_tokens_spent"] == 0
+
+
+def test_release_leaves_seats_that_changed_holder():
+    repo = InMemoryRepository()
+    repo.seats[1] = {"_id": 1, "status": "occupied", "booked_by": "new", "floor": 1}
+    assert asyncio.run(repo.release_seats([{"_id": 1, "booked_by": "old"}])) == 0
+    assert repo.seats[1]["booked_by"] == "new"
+
+
+def test_admin_routes_need_an_admin(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_W3_IDS", {"boss"})
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "someone"}
+    try:
+        response = TestClient(app).post("/admin/seats/release", json={"floor": 1})
+        assert response.status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_reprice_leaves_seats_already_at_the_price_alone(monkeypatch):
+    repo = InMemoryRepository()
+    for i in range(1, 5):
+        repo.seats[i] = {"_id": i, "status": "available", "floor": 1, "price": 5 if i <= 2 else 3, "version": 0}
+    monkeypatch.setattr(admin, "ADMIN_W3_IDS", {"boss"})
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "boss"}
+    app.dependency_overrides[repository.get_repository] = lambda: repo
+    try:
+        response = TestClient(app).post("/admin/seats/price", json={"floor": 1, "price": 5})
+        assert response.json() == {"matched": 4, "updated": 2}
+        assert [repo.seats[i]["version"] for i in range(1, 5)] == [0, 0, 1, 1]
+    finally:
+        app.dependency_overrides.clear()
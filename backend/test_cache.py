@@ -0,0 +1,95 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from auth import get_current_user
+from cache import LocalCache, MISSING
+from invalidation import InMemoryBroker
+from repository import InMemoryRepository, get_read_repository, get_repository
+
+
+def test_invalidation_fans_out_to_every_worker():
+    broker = InMemoryBroker()
+    workers = []
+    for _ in range(3):
+        bus = broker.bus()
+        seats = LocalCache("seats", ttl=60)
+        bus.subscribe(lambda topic, key, seats=seats: seats.invalidate(key))
+        seats.set(1, "available", seats.generation)
+        workers.append((bus, seats))
+
+    workers[0][0].publish("seats", 1)
+
+    for _, seats in workers:
+        assert seats.get(1) is MISSING
+
+
+def test_stale_load_is_not_cached():
+    seats = LocalCache("seats", ttl=60)
+
+    async def slow_load():
+        # a write lands in another worker while this read is in flight
+        seats.invalidate()
+        return "available"
+
+    assert asyncio.run(seats.get_or_load(1, slow_load)) == "available"
+    assert seats.get(1) is MISSING
+
+
+def test_entries_expire():
+    seats = LocalCache("seats", ttl=-1)
+    seats.set(1, "available", seats.generation)
+    assert seats.get(1) is MISSING
+
+
+def test_read_after_a_write_does_not_join_the_earlier_flight():
+    class Reader:
+        def __init__(self):
+            self.reads = []
+
+        async def list_seats(self):
+            state = "before" if not self.reads else "after"
+            self.reads.append(state)
+            await asyncio.sleep(0.01)
+            return [{"_id": 1, "status": state}]
+
+    async def run():
+        seats, reader = main.cache.seat_cache, Reader()
+        seats.invalidate()
+        load = lambda: seats.get_or_load(main.cache.SEAT_LIST, lambda: main._load_seat_list(reader))
+        first = asyncio.create_task(load())
+        await asyncio.sleep(0)
+        # a write lands while the first read is in flight
+        seats.invalidate()
+        second = await load()
+        assert (await first)[0][0]["status"] == "before"
+        assert second[0][0]["status"] == "after"
+        assert seats.get(main.cache.SEAT_LIST)[0][0]["status"] == "after"
+        seats.invalidate()
+
+    asyncio.run(run())
+
+
+def test_me_reads_its_own_write_from_the_primary():
+    primary, secondary = InMemoryRepository(), InMemoryRepository()
+    primary.employees["me"] = {"w3_id": "me", "blue_tokens_spent": 5, "last_booked_seat": 7}
+    # the secondary has not caught up with the booking yet
+    secondary.employees["me"] = {"w3_id": "me", "blue_tokens_spent": 0, "last_booked_seat": None}
+    main.app.dependency_overrides[get_current_user] = lambda: {"w3_id": "me", "name": "Me"}
+    main.app.dependency_overrides[get_repository] = lambda: primary
+    main.app.dependency_overrides[get_read_repository] = lambda: secondary
+    employees = main.cache.employee_cache
+    try:
+        client = TestClient(main.app)
+        employees.wrote("me")
+        employees.invalidate("me")
+        body = client.get("/me").json()
+        assert body == {"w3_id": "me", "name": "Me", "email": None, "blue_tokens_spent": 5, "last_booked_seat": 7}
+        # once the primary's answer is cached, later reloads use the reader
+        assert not employees.needs_primary("me")
+        employees.invalidate("me")
+        assert client.get("/me").json()["blue_tokens_spent"] == 0
+    finally:
+        main.app.dependency_overrides.clear()
+        employees.invalidate()
@@ -0,0 +1,102 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import capture
+from benchmarks import replay
+
+
+def test_capture_records_requests_with_anonymized_user(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    inner = FastAPI()
+
+    @inner.post("/book/{seat_id}")
+    async def book(seat_id: int, body: dict):
+        return {"seat_id": seat_id}
+
+    @inner.get("/healthz")
+    async def healthz():
+        return {}
+
+    captured = capture.CaptureMiddleware(inner)
+
+    async def app(scope, receive, send):
+        scope["session"] = {"user": {"w3_id": "jane@ibm.com"}}
+        await captured(scope, receive, send)
+
+    capture.start(str(path))
+    try:
+        client = TestClient(app)
+        client.post("/book/4?x=1", json={"date": "Today"})
+        client.get("/healthz")
+    finally:
+        capture.stop()
+
+    (entry,) = capture.load(str(path))
+    assert entry["method"] == "POST"
+    assert entry["path"] == "/book/4?x=1"
+    assert entry["route"] == "/book/{seat_id}"
+    assert entry["json"] == {"date": "Today"}
+    assert entry["status"] == 200
+    assert entry["user"] == capture.anonymize("jane@ibm.com") != "jane@ibm.com"
+
+
+def test_capture_never_writes_raw_ids(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    inner = FastAPI()
+
+    @inner.get("/seats/recommend")
+    async def recommend(teammates: str):
+        return {}
+
+    @inner.post("/notes")
+    async def notes(body: dict):
+        return {}
+
+    @inner.get("/auth/ibm/callback")
+    async def callback(code: str):
+        return {}
+
+    capture.start(str(path))
+    try:
+        client = TestClient(capture.CaptureMiddleware(inner))
+        client.get("/seats/recommend?teammates=jane@ibm.com,joe@ibm.com&k=3")
+        client.post("/notes", json={"w3_id": "jane@ibm.com", "seats": [{"booked_by": "joe@ibm.com"}]})
+        client.get("/auth/ibm/callback?code=secret")
+    finally:
+        capture.stop()
+
+    recommend, notes = capture.load(str(path))
+    text = path.read_text()
+    assert "jane@ibm.com" not in text and "joe@ibm.com" not in text and "secret" not in text
+    jane, joe = capture.anonymize("jane@ibm.com"), capture.anonymize("joe@ibm.com")
+    assert recommend["path"] == f"/seats/recommend?teammates={jane},{joe}&k=3"
+    assert notes["json"] == {"w3_id": jane, "seats": [{"booked_by": joe}]}
+
+
+def test_replay_reports_latency_per_route():
+    entries = [{"t": i * 0.01, "method": "GET", "path": "/healthz", "route": "/healthz"} for i in range(20)]
+    results, lags, elapsed = asyncio.run(replay.replay(entries, speed=10))
+    report = replay.summarize(results, lags, elapsed, 10)
+    assert report["routes"]["GET /healthz"]["count"] == 20
+    assert report["routes"]["GET /healthz"]["status"] == {200: 20}
+    assert elapsed >= 0.019 - 0.005
+
+
+def test_invariants_catch_double_bookings_and_token_drift():
+    seats = [
+        {"_id": 1, "status": "occupied", "booked_by": "a"},
+        {"_id": 2, "status": "occupied", "booked_by": "c"},
+    ]
+    employees = [
+        {"w3_id": "a", "booked_seats": [1], "blue_tokens_spent": replay.SEAT_COST},
+        {"w3_id": "b", "booked_seats": [1], "blue_tokens_spent": 0},
+    ]
+    violations = replay.check_invariants(seats, employees, [("POST /book", 500, 0.01)])
+    assert any("double-booked" in v for v in violations)
+    assert any(v.startswith("b spent 0 tokens") for v in violations)
+    assert any("seat 2 occupied by c" in v for v in violations)
+    assert violations[-1] == "1 responses were 5xx"
+
+    assert replay.check_invariants(seats[:1], employees[:1], []) == []
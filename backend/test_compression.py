@@ -0,0 +1,64 @@
+import gzip
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import compression
+import seat_mirror
+from auth import get_current_user
+from repository import get_read_repository
+from main import app
+from seat_table import SeatTable
+
+
+def test_negotiate_prefers_supported_encodings():
+    assert compression.negotiate(None) is None
+    assert compression.negotiate("identity") is None
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("deflate, gzip;q=0.5") == "gzip"
+    expected = "br" if compression.brotli else "gzip"
+    assert compression.negotiate("gzip, br") == expected
+
+
+def test_snapshot_compressed_once_per_version():
+    calls = []
+    snapshots = compression.SnapshotCache(min_bytes=10)
+
+    def render():
+        calls.append(1)
+        return b"x" * 100
+
+    body, encoding = snapshots.get(1, "rows", "gzip", render)
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == b"x" * 100
+    assert snapshots.get(1, "rows", "gzip", render)[0] is body
+    assert snapshots.get(1, "rows", None, render) == (b"x" * 100, None)
+    assert len(calls) == 1
+
+    snapshots.get(2, "rows", "gzip", render)
+    assert len(calls) == 2
+
+
+def test_get_seats_negotiates_encoding_and_shape():
+    mirror = seat_mirror.SeatMirror(collection=None, table=SeatTable())
+    mirror.table.load([{"_id": i, "status": "available", "price": 5} for i in range(1, 201)])
+    mirror.ready = True
+    mirror.synced_at = datetime.utcnow()
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "a"}
+    app.dependency_overrides[get_read_repository] = lambda: None
+    seat_mirror._mirror = mirror
+    try:
+        client = TestClient(app)
+        response = client.get("/seats", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()) == 200
+
+        response = client.get("/seats?shape=columnar", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        body = json.loads(response.content)
+        assert body["_id"][:3] == [1, 2, 3]
+        assert set(body["status"]) == {"available"}
+    finally:
+        seat_mirror._mirror = None
+        app.dependency_overrides.clear()
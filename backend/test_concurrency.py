@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import concurrency
+
+
+class FakeCollection:
+    """Records update_one calls and matches whatever ``matched`` says."""
+
+    def __init__(self, matched=1, upserted_id=None, error=None):
+        self.calls = []
+        self.matched = matched
+        self.upserted_id = upserted_id
+        self.error = error
+
+    async def update_one(self, query, update, **kwargs):
+        self.calls.append((query, update, kwargs))
+        if self.error:
+            raise self.error
+        return SimpleNamespace(matched_count=self.matched, upserted_id=self.upserted_id)
+
+
+def test_version_filter_pins_read_version():
+    assert concurrency.version_filter({"version": 3}) == {"version": 3}
+    # documents from before versions, or not there at all
+    assert concurrency.version_filter({"_id": 1}) == {"version": {"$exists": False}}
+    assert concurrency.version_filter(None) == {"version": {"$exists": False}}
+    assert concurrency.next_version({"version": 3}) == 4 and concurrency.next_version(None) == 1
+
+
+def test_cas_update_bumps_version_and_raises_when_it_moved():
+    seats = FakeCollection()
+    asyncio.run(concurrency.cas_update(seats, {"_id": 1, "status": "available"}, {"version": 2}, {"$set": {"status": "occupied"}}))
+    query, update, _ = seats.calls[0]
+    assert query == {"_id": 1, "status": "available", "version": 2}
+    assert update == {"$set": {"status": "occupied"}, "$inc": {"version": 1}}
+
+    with pytest.raises(concurrency.Conflict):
+        asyncio.run(concurrency.cas_update(FakeCollection(matched=0), {"_id": 1}, {"version": 2}, {"$inc": {"n": 1}}))
+    # an upsert that inserted is a success, one that hit the unique index is not
+    asyncio.run(concurrency.cas_update(FakeCollection(matched=0, upserted_id="x"), {"w3_id": "a"}, None, {}, upsert=True))
+    with pytest.raises(concurrency.Conflict):
+        asyncio.run(
+            concurrency.cas_update(FakeCollection(error=DuplicateKeyError("dup")), {"w3_id": "a"}, None, {}, upsert=True)
+        )
+
+
+def test_retry_reruns_until_no_conflict():
+    attempts = []
+
+    async def operation():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise concurrency.Conflict()
+        return "done"
+
+    concurrency.stats.clear()
+    assert asyncio.run(concurrency.retry(operation, attempts=5, base_delay=0.001)) == "done"
+    assert len(attempts) == 3
+    assert concurrency.stats == {"attempts": 3, "conflicts": 2}
+
+
+def test_retry_gives_up_after_bounded_attempts():
+    async def operation():
+        raise concurrency.Conflict()
+
+    concurrency.stats.clear()
+    with pytest.raises(concurrency.Conflict):
+        asyncio.run(concurrency.retry(operation, attempts=3, base_delay=0.001))
+    assert concurrency.stats["exhausted"] == 1
+    assert concurrency.stats["attempts"] == 3
+
+
+def test_missing_unique_index_is_not_swallowed():
+    class Employees:
+        async def create_index(self, key, unique):
+            raise OperationFailure("E11000 duplicate key")
+
+    with pytest.raises(concurrency.IndexMissing):
+        asyncio.run(concurrency.ensure_indexes(Employees()))
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import monitoring, ReadPreference
+
+import database
+from auth import get_current_user
+from main import app
+
+
+def test_client_is_shared():
+    database.close()
+    try:
+        client = database.connect()
+        assert database.get_client() is client
+        assert database.get_seats_collection().database == database.get_employees_collection().database
+    finally:
+        database.close()
+
+
+def test_pool_options_are_applied():
+    database.close()
+    try:
+        options = database.connect().options.pool_options
+        assert options.max_pool_size == database.MONGO_MAX_POOL_SIZE
+        assert options.min_pool_size == database.MONGO_MIN_POOL_SIZE
+    finally:
+        database.close()
+
+
+def test_pool_stats_counts_checkouts():
+    stats = database.PoolStats()
+    stats.connection_created(None)
+    stats.connection_checked_out(None)
+    assert stats.as_dict()["open"] == 1
+    assert stats.as_dict()["in_use"] == 1
+
+    stats.connection_checked_in(None)
+    assert stats.in_use == 0
+
+    class Failed:
+        reason = monitoring.ConnectionCheckOutFailedReason.TIMEOUT
+
+    stats.connection_check_out_failed(Failed())
+    assert stats.wait_queue_timeouts == 1
+
+
+def test_conflict_checks_read_primary():
+    database.close()
+    try:
+        assert database.get_seats_collection().read_preference.mode == ReadPreference.PRIMARY.mode
+        assert database.get_employees_collection().read_preference.mode == ReadPreference.PRIMARY.mode
+    finally:
+        database.close()
+
+
+def test_seat_reads_prefer_secondaries(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(database, "MONGO_READ_MAX_STALENESS_SECONDS", 120)
+    database.close()
+    try:
+        pref = database.get_seats_read_collection().read_preference
+        assert pref.mongos_mode == "secondaryPreferred"
+        assert pref.max_staleness == 120
+        assert database.snapshot_headers()["X-Snapshot-Max-Staleness"] == "120"
+    finally:
+        database.close()
+
+
+def test_read_preference_follows_the_setting(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_READ_PREFERENCE", "primary")
+    database.close()
+    try:
+        assert database.get_seats_read_collection().read_preference.mode == ReadPreference.PRIMARY.mode
+        assert database.snapshot_headers()["X-Read-Preference"] == "primary"
+        monkeypatch.setattr(database, "MONGO_READ_PREFERENCE", "nearest")
+        assert database.get_seats_read_collection().read_preference.mongos_mode == "nearest"
+    finally:
+        database.close()
+
+
+def test_bad_read_settings_fail_fast():
+    database.check_read_settings("secondaryPreferred", -1)
+    database.check_read_settings("nearest", 90)
+    with pytest.raises(ValueError):
+        database.check_read_settings("secondaryPreferred", 30)
+    with pytest.raises(ValueError):
+        database.check_read_settings("secondary_preferred", 90)
+
+
+def test_pool_stats_need_a_signed_in_user():
+    client = TestClient(app)
+    assert client.get("/db/pool").status_code == 401
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "a"}
+    try:
+        body = client.get("/db/pool").json()
+        assert set(body) == {"options", "stats"}
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,73 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import health
+import main
+from main import app
+from repository import InMemoryRepository
+
+client = TestClient(app)
+
+
+def test_liveness_needs_no_auth():
+    assert client.get("/healthz").status_code == 200
+
+
+def test_readiness_follows_warm_up(monkeypatch):
+    monkeypatch.setattr(health, "_last_ping", {"ok": True, "latency_ms": 1.0, "checked_at": "now"})
+    monkeypatch.setattr(health, "_last_ping_at", health.time.monotonic())
+    health.mark_not_ready("starting")
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["reason"] == "starting"
+
+    health.mark_ready()
+    assert client.get("/readyz").status_code == 200
+
+
+def test_readiness_pings_database_at_most_once_per_interval(monkeypatch):
+    pings = []
+
+    async def fake_ping():
+        pings.append(1)
+        health._last_ping = {"ok": True, "latency_ms": 1.0, "checked_at": "now"}
+        health._last_ping_at = health.time.monotonic()
+        return health._last_ping
+
+    monkeypatch.setattr(health, "_ping", fake_ping)
+    monkeypatch.setattr(health, "_last_ping", None)
+    health.mark_ready()
+    for _ in range(5):
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+    assert len(pings) == 1
+
+
+def test_unreachable_database_is_not_ready(monkeypatch):
+    monkeypatch.setattr(health, "_last_ping", {"ok": False, "error": "ServerSelectionTimeoutError"})
+    monkeypatch.setattr(health, "_last_ping_at", health.time.monotonic())
+    health.mark_ready()
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["reason"] == "database unreachable"
+
+
+def test_warm_up_retries_after_an_unexpected_error(caplog):
+    class FlakyRepository(InMemoryRepository):
+        def __init__(self):
+            super().__init__()
+            self.attempts = 0
+
+        async def seed_seats(self, docs):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise ValueError("bad seed document")
+            await super().seed_seats(docs)
+
+    repo = FlakyRepository()
+    health.mark_not_ready("starting")
+    asyncio.run(main.warm_up(repo))
+    assert repo.attempts == 2 and health.is_ready()
+    assert "bad seed document" in caplog.text
@@ -0,0 +1,57 @@
+import io
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+import log_config
+from main import app
+
+
+def test_parse_log_level_with_sampling_rules():
+    level, rules = log_config.parse_log_level("DEBUG;/book=0.1;/auth/*=1;bogus")
+    assert level == logging.DEBUG
+    assert rules == [("/book", 0.1), ("/auth/*", 1.0)]
+    assert log_config.parse_log_level("nonsense")[0] == logging.INFO
+
+
+def test_debug_records_are_sampled_per_route():
+    sampler = log_config.DebugSampler([("/seats", 0.0), ("/auth/*", 1.0)])
+    debug = logging.makeLogRecord({"levelno": logging.DEBUG})
+    info = logging.makeLogRecord({"levelno": logging.INFO})
+
+    token = log_config.route_var.set("/seats")
+    try:
+        assert not sampler.filter(debug)
+        assert sampler.filter(info)
+    finally:
+        log_config.route_var.reset(token)
+
+    token = log_config.route_var.set("/auth/ibm/callback")
+    try:
+        assert sampler.filter(debug)
+    finally:
+        log_config.route_var.reset(token)
+
+
+def test_json_lines_carry_request_id():
+    out = io.StringIO()
+    log_config.start("DEBUG", "json", stream=out)
+    try:
+        client = TestClient(app)
+        response = client.get("/healthz", headers={"X-Request-ID": "req-123"})
+        assert response.headers["x-request-id"] == "req-123"
+
+        token = log_config.request_id_var.set("req-456")
+        try:
+            logging.getLogger("booking").debug("Seat %s booked", 7, extra={"seat_id": 7})
+        finally:
+            log_config.request_id_var.reset(token)
+    finally:
+        log_config.stop()
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    entry = next(line for line in lines if line["logger"] == "booking")
+    assert entry["msg"] == "Seat 7 booked"
+    assert entry["request_id"] == "req-456"
+    assert entry["seat_id"] == 7
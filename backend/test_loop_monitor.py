@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import metrics
+from benchmarks import loop_lag
+from loop_monitor import LoopLagMonitor
+from main import app
+
+
+def test_blocking_call_is_reported_with_its_stack():
+    monitor = LoopLagMonitor(interval=0.01, debug=True, block_threshold=0.05)
+
+    def hold_the_loop():
+        time.sleep(0.3)
+
+    async def run():
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        hold_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.blocked_total >= 1
+    assert "hold_the_loop" in monitor.blocked[0]["stack"]
+    assert monitor.percentiles()["max"] >= 0.2
+
+
+def test_metrics_endpoint_reports_routes_and_loop_lag():
+    metrics.reset()
+    client = TestClient(app)
+    client.get("/healthz")
+    client.get("/healthz")
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/healthz"} 2' in body
+    assert 'event_loop_lag_seconds{quantile="0.99"}' in body
+
+
+def test_loop_lag_benchmark_smoke():
+    report, monitor = loop_lag.run(requests=200, concurrency=5, seats=200, block_ms=250)
+    assert monitor.samples > 0
+    assert report["event_loop_blocked"] == 0
+    assert sum(r["count"] for r in report["routes"].values()) == 200
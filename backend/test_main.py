@@ -1,11 +1,38 @@
+import asyncio
+
 from fastapi.testclient import TestClient
-from main import app
+
+import repository
+from auth import get_current_user
+from benchmarks.replay import USER_HEADER, replay_user
+from main import app, seed
 
 client = TestClient(app)
 
+_previous = None
+
+
+# Runs on STORAGE_BACKEND=memory with the session replaced by a header, so
+# no Mongo or IdP is needed.
+def setup_module():
+    global _previous
+    _previous = repository._repository
+    asyncio.run(seed(repository.create_repository("memory")))
+    app.dependency_overrides[get_current_user] = replay_user
+
+
+def teardown_module():
+    repository._repository = _previous
+    app.dependency_overrides.clear()
+
+
+def as_user(w3_id):
+    return {USER_HEADER: w3_id}
+
+
 # API TESTING — Endpoint availability
 def test_get_seats_api():
-    response = client.get("/seats")
+    response = client.get("/seats", headers=as_user("viewer@ibm.com"))
     assert response.status_code == 200
     assert len(response.json()) == 100
 
@@ -20,9 +47,10 @@ def test_successful_seat_booking():
         "time_slot": "12:00 PM"
     }
 
-    response = client.post("/book", json=payload)
+    response = client.post("/book", json=payload, headers=as_user("test.user@ibm.com"))
     assert response.status_code == 200
-    assert "Blu Dollars" in response.json()["message"]
+    assert response.json()["message"] == "Seat booked"
+    assert client.get("/me", headers=as_user("test.user@ibm.com")).json()["blue_tokens_spent"] == 5
 
 #NEGATIVE TESTING — Double booking
 def test_double_booking_not_allowed():
@@ -34,12 +62,12 @@ def test_double_booking_not_allowed():
         "time_slot": "12:30 PM"
     }
 
-    response1 = client.post("/book", json=payload)
+    response1 = client.post("/book", json=payload, headers=as_user("user2@ibm.com"))
     assert response1.status_code == 200
 
-    response2 = client.post("/book", json=payload)
+    response2 = client.post("/book", json=payload, headers=as_user("user3@ibm.com"))
     assert response2.status_code == 400
-    assert response2.json()["detail"] == "Seat taken"
+    assert response2.json()["detail"] == "Seat unavailable"
 
 
 # VALIDATION TESTING — Missing fields
@@ -49,7 +77,7 @@ def test_booking_missing_fields():
         "w3_id": "invalid@ibm.com"
     }
 
-    response = client.post("/book", json=payload)
+    response = client.post("/book", json=payload, headers=as_user("invalid@ibm.com"))
     assert response.status_code == 422
 
 
@@ -63,8 +91,9 @@ def test_invalid_seat_id():
         "time_slot": "1:00 PM"
     }
 
-    response = client.post("/book", json=payload)
-    assert response.status_code == 404
+    response = client.post("/book", json=payload, headers=as_user("ghost@ibm.com"))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Seat unavailable"
 
 
 
@@ -78,8 +107,10 @@ def test_release_seat():
         "time_slot": "2:00 PM"
     }
 
-    client.post("/book", json=payload)
+    client.post("/book", json=payload, headers=as_user("release@ibm.com"))
 
-    response = client.post("/release/10")
+    response = client.post("/release/10", headers=as_user("release@ibm.com"))
     assert response.status_code == 200
-    assert response.json()["seat"]["status"] == "available"
+    assert response.json()["tokens_refunded"] == 5
+    seats = client.get("/seats", headers=as_user("release@ibm.com")).json()
+    assert next(s for s in seats if s["_id"] == 10)["status"] == "available"
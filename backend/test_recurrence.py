@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import recurrence
+from recurrence import RecurrenceRule, occurrences, plan, resolve_date, rule_document, to_datetime
+
+MONDAY = date(2026, 3, 2)
+
+
+def rule(seat_id, start, end, weekdays=(0, 1, 2, 3, 4), w3_id="me", skip=()):
+    return {
+        "seat_id": seat_id,
+        "w3_id": w3_id,
+        "start": to_datetime(start),
+        "end": to_datetime(end),
+        "weekdays": list(weekdays),
+        "except": [to_datetime(d) for d in skip],
+        "time_slot": "9:00 AM",
+    }
+
+
+def seat(seat_id, status="available", w3_id=None):
+    return {"seat_id": seat_id, "status": status, "w3_id": w3_id, "live": True}
+
+
+def test_resolve_date_understands_ui_labels_and_iso():
+    assert resolve_date("Today", MONDAY) == MONDAY
+    assert resolve_date("tomorrow", MONDAY) == MONDAY + timedelta(days=1)
+    assert resolve_date("Day After", MONDAY) == MONDAY + timedelta(days=2)
+    assert resolve_date("2026-04-01", MONDAY) == date(2026, 4, 1)
+    with pytest.raises(ValueError):
+        resolve_date("someday", MONDAY)
+
+
+def test_occurrences_follow_weekdays_and_skip_exceptions():
+    r = rule(1, MONDAY, MONDAY + timedelta(days=13), weekdays=(0, 2), skip=[MONDAY + timedelta(days=7)])
+    assert list(occurrences(r)) == [MONDAY, MONDAY + timedelta(days=2), MONDAY + timedelta(days=9)]
+    assert list(occurrences(r, start=MONDAY + timedelta(days=1), end=MONDAY + timedelta(days=8))) == [
+        MONDAY + timedelta(days=2)
+    ]
+
+
+def test_rule_document_defaults():
+    single = rule_document(RecurrenceRule(seat_id=1, start="Tomorrow", time_slot="9:00 AM"), "me", MONDAY)
+    assert single["weekdays"] == [1] and single["start"] == single["end"]
+    ranged = rule_document(RecurrenceRule(seat_id=1, start="Today", end="2026-03-31", time_slot="9:00 AM"), "me", MONDAY)
+    assert ranged["weekdays"] == recurrence.WORKDAYS
+    with pytest.raises(HTTPException):
+        rule_document(RecurrenceRule(seat_id=1, start="2026-03-01", time_slot="9:00 AM"), "me", MONDAY)
+    with pytest.raises(HTTPException):
+        rule_document(RecurrenceRule(seat_id=1, start="Today", end="2027-01-01", time_slot="9:00 AM"), "me", MONDAY)
+
+
+def test_plan_rejects_dates_held_by_other_rules_only_where_they_really_overlap():
+    month = rule(1, MONDAY, MONDAY + timedelta(days=27))
+    # Tuesdays only on the same seat: overlaps 4 days
+    other = {**rule(1, MONDAY, MONDAY + timedelta(days=27), weekdays=(1,), w3_id="them"), "_id": "x"}
+    # weekends only: shares no dates
+    weekend = {**rule(1, MONDAY, MONDAY + timedelta(days=27), weekdays=(5, 6), w3_id="them"), "_id": "y"}
+
+    accepted, conflicts = plan([dict(month)], [other, weekend, seat(1)], "me", MONDAY)
+    assert accepted == []
+    assert len(conflicts[0]["dates"]) == 4
+
+    accepted, conflicts = plan([dict(month)], [other, weekend, seat(1)], "me", MONDAY, on_conflict="skip")
+    assert len(list(occurrences(accepted[0]))) == 20 - 4
+    assert len(accepted[0]["except"]) == 4
+
+
+def test_plan_keeps_one_seat_per_employee_per_day():
+    week = rule(1, MONDAY, MONDAY + timedelta(days=4))
+    elsewhere = rule(2, MONDAY + timedelta(days=4), MONDAY + timedelta(days=4))
+    accepted, conflicts = plan([dict(week), dict(elsewhere)], [seat(1), seat(2)], "me", MONDAY)
+    assert [r["seat_id"] for r in accepted] == [1]
+    assert conflicts == [{"seat_id": 2, "dates": [(MONDAY + timedelta(days=4)).isoformat()]}]
+
+    # the seat booked right now through /book blocks today for others, and
+    # for the holder only on a different seat
+    accepted, conflicts = plan([dict(week)], [seat(1, "occupied", "them")], "me", MONDAY, "skip")
+    assert conflicts[0]["dates"] == [MONDAY.isoformat()]
+    accepted, conflicts = plan([dict(week)], [seat(1, "occupied", "me")], "me", MONDAY)
+    assert conflicts == []
+
+
+def test_plan_reports_unknown_seats():
+    with pytest.raises(HTTPException) as e:
+        plan([rule(999, MONDAY, MONDAY)], [], "me", MONDAY)
+    assert e.value.status_code == 404
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import repository
+from auth import get_current_user
+from benchmarks.replay import USER_HEADER, check_invariants, replay_user
+from concurrency import Conflict
+from main import app, seed
+from recurrence import plan, to_datetime
+from repository import InMemoryRepository, MongoRepository, Repository
+
+MONDAY = date(2026, 3, 2)
+
+
+def rule(seat_id, start, end, weekdays=(0, 1, 2, 3, 4), w3_id="me"):
+    return {
+        "seat_id": seat_id,
+        "w3_id": w3_id,
+        "start": to_datetime(start),
+        "end": to_datetime(end),
+        "weekdays": list(weekdays),
+        "except": [],
+        "time_slot": "9:00 AM",
+    }
+
+
+def test_an_engine_must_implement_every_operation():
+    class Partial(Repository):
+        async def get_seat(self, seat_id):
+            return None
+
+    with pytest.raises(TypeError, match="list_seats"):
+        Partial()
+
+
+def test_conflict_pipeline_is_one_bounded_aggregation():
+    rules = [rule(1, MONDAY, MONDAY + timedelta(days=6), weekdays=(0,)), rule(3, MONDAY, MONDAY, weekdays=(4,))]
+    match, _, union = repository.conflict_pipeline(rules, "me")
+    assert match["$match"]["$or"] == [{"seat_id": {"$in": [1, 3]}}, {"w3_id": "me"}]
+    assert match["$match"]["weekdays"] == {"$in": [0, 4]}
+    assert match["$match"]["start"] == {"$lte": to_datetime(MONDAY + timedelta(days=6))}
+    assert union["$unionWith"]["coll"] == "seats"
+
+
+class FakeSeats:
+    def __init__(self):
+        self.updates = []
+
+    async def update_many(self, query, update):
+        self.updates.append((query, update))
+        return SimpleNamespace(modified_count=len(query.get("$or", ())))
+
+    async def count_documents(self, query):
+        return 4
+
+
+def test_mongo_release_pins_each_seat_to_its_holder(monkeypatch):
+    seats = FakeSeats()
+    monkeypatch.setattr(repository.database, "get_seats_collection", lambda: seats)
+    released = asyncio.run(MongoRepository().release_seats([{"_id": 1, "booked_by": "a"}, {"_id": 2, "booked_by": "b"}]))
+    query, update = seats.updates[0]
+    assert released == 2
+    assert query["$or"] == [{"_id": 1, "booked_by": "a"}, {"_id": 2, "booked_by": "b"}]
+    assert query["status"] == "occupied"
+    assert update["$inc"] == {"version": 1}
+
+
+def test_mongo_reprice_skips_seats_already_at_the_price(monkeypatch):
+    seats = FakeSeats()
+    monkeypatch.setattr(repository.database, "get_seats_collection", lambda: seats)
+    matched, _ = asyncio.run(MongoRepository().reprice_seats({"floor": 2}, 7))
+    assert matched == 4
+    assert seats.updates[0][0] == {"floor": 2, "price": {"$ne": 7}}
+
+
+class FakeEmployees:
+    def __init__(self):
+        self.upserts = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.upserts.append(upsert)
+        return SimpleNamespace(matched_count=0, upserted_id="new" if upsert else None)
+
+
+def test_mongo_booking_only_creates_a_missing_employee(monkeypatch):
+    employees = FakeEmployees()
+    monkeypatch.setattr(repository.database, "get_employees_collection", lambda: employees)
+    asyncio.run(MongoRepository().record_booking(None, "a", 1, 5, datetime.utcnow()))
+    # a known employee whose version moved is a conflict, not a second document
+    with pytest.raises(Conflict):
+        asyncio.run(MongoRepository().record_booking({"w3_id": "a", "version": 1}, "a", 2, 5, datetime.utcnow()))
+    assert employees.upserts == [True, False]
+
+
+def test_memory_claim_is_a_compare_and_swap():
+    repo = InMemoryRepository()
+    asyncio.run(repo.seed_seats([{"_id": 1, "status": "available", "price": 5, "version": 0}]))
+    seat = asyncio.run(repo.get_seat(1))
+    asyncio.run(repo.claim_seat(seat, "a", datetime.utcnow()))
+    # the copy read before the claim is stale now
+    with pytest.raises(Conflict):
+        asyncio.run(repo.claim_seat(seat, "b", datetime.utcnow()))
+    with pytest.raises(Conflict):
+        asyncio.run(repo.free_seat(seat, "a"))
+    assert repo.seats[1]["booked_by"] == "a" and repo.seats[1]["version"] == 1
+    # reads hand out copies
+    asyncio.run(repo.get_seat(1))["status"] = "available"
+    assert repo.seats[1]["status"] == "occupied"
+
+
+def test_memory_refund_happens_once():
+    repo = InMemoryRepository()
+    asyncio.run(repo.record_booking(None, "a", 1, 5, datetime.utcnow()))
+    with pytest.raises(Conflict):
+        asyncio.run(repo.record_booking(None, "a", 2, 5, datetime.utcnow()))
+    assert asyncio.run(repo.refund_booking("a", 1, 5))
+    assert not asyncio.run(repo.refund_booking("a", 1, 5))
+    assert repo.employees["a"]["blue_tokens_spent"] == 0
+
+
+def test_memory_reservation_candidates_feed_plan():
+    repo = InMemoryRepository()
+    asyncio.run(repo.seed_seats([{"_id": 1, "status": "available"}, {"_id": 2, "status": "occupied", "booked_by": "me"}]))
+    theirs = rule(1, MONDAY, MONDAY + timedelta(days=4), weekdays=(0,), w3_id="them")
+    asyncio.run(repo.insert_reservations([theirs, rule(2, MONDAY, MONDAY, weekdays=(6,), w3_id="them")]))
+    wanted = rule(1, MONDAY, MONDAY + timedelta(days=4))
+    candidates = asyncio.run(repo.reservation_candidates([wanted], "me"))
+    # the Sunday rule shares no weekday; seat 2 was not asked for
+    assert [c.get("live", False) for c in candidates] == [False, True]
+    _, conflicts = plan([wanted], candidates, "me", MONDAY)
+    assert conflicts == [{"seat_id": 1, "dates": [MONDAY.isoformat()]}]
+    assert asyncio.run(repo.reserved_by_other(1, "me", to_datetime(MONDAY)))
+    assert asyncio.run(repo.reserved_seat_ids(to_datetime(MONDAY))) == [1]
+
+
+async def race(users, seat_id):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        body = {"seat_id": seat_id, "date": "Today", "time_slot": "9:00 AM"}
+        return await asyncio.gather(
+            *(client.post("/book", json=body, headers={USER_HEADER: w3_id}) for w3_id in users)
+        )
+
+
+def test_concurrent_bookings_on_the_memory_engine():
+    repo = InMemoryRepository(latency=0.001)
+    previous = repository._repository
+    repository._repository = repo
+    app.dependency_overrides[get_current_user] = replay_user
+    try:
+        asyncio.run(seed(repo))
+        responses = asyncio.run(race([f"user{i}" for i in range(10)], 7))
+        assert sorted(r.status_code for r in responses) == [200] + [400] * 9
+        assert check_invariants(list(repo.seats.values()), list(repo.employees.values()), []) == []
+    finally:
+        repository._repository = previous
+        app.dependency_overrides.clear()
@@ -0,0 +1,159 @@
+import math
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+import cache
+import seat_mirror
+from auth import get_current_user
+from main import app
+from repository import SEAT_LIST_LIMIT, InMemoryRepository, get_read_repository
+from seat_index import GridIndex
+from seat_mirror import SeatMirror
+from seat_table import SeatTable
+
+
+def brute_force(points, x, y, k, floor):
+    hits = sorted(
+        (math.hypot(px - x, py - y), row)
+        for row, (f, px, py) in points.items()
+        if f == floor
+    )
+    return hits[:k]
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    index = GridIndex(cell_size=3)
+    points = {}
+    for row in range(2000):
+        point = (rng.randint(1, 2), rng.uniform(0, 100), rng.uniform(0, 60))
+        points[row] = point
+        index.add(row, *point)
+    for row in range(0, 2000, 3):
+        index.remove(row)
+        del points[row]
+
+    for _ in range(50):
+        x, y, floor = rng.uniform(-20, 120), rng.uniform(-20, 80), rng.randint(1, 2)
+        got = index.nearest(x, y, 7, floor=floor)
+        want = brute_force(points, x, y, 7, floor)
+        assert [round(d, 9) for d, _ in got] == [round(d, 9) for d, _ in want]
+
+
+def test_far_away_query_is_clipped_to_the_seats():
+    index = GridIndex(cell_size=4)
+    points = {row: (1, float(row % 10), float(row // 10)) for row in range(100)}
+    for row, point in points.items():
+        index.add(row, *point)
+    visited = []
+    started = time.perf_counter()
+    got = index.nearest(1e9, -1e9, 3, floor=1, accept=lambda row: visited.append(row) or True)
+    assert time.perf_counter() - started < 0.5
+    assert [row for _, row in got] == [row for _, row in brute_force(points, 1e9, -1e9, 3, 1)]
+    assert len(visited) <= len(points)
+
+
+def test_booking_removes_seat_from_recommendations():
+    table = SeatTable()
+    table.load([
+        {"_id": 1, "status": "available", "floor": 1, "x": 0.0, "y": 0.0, "zone": "A"},
+        {"_id": 2, "status": "available", "floor": 1, "x": 1.0, "y": 0.0, "zone": "A"},
+        {"_id": 3, "status": "available", "floor": 1, "x": 5.0, "y": 0.0, "zone": "B"},
+        {"_id": 4, "status": "available", "floor": 1},
+    ])
+    assert [s["_id"] for s in table.nearest_available(0, 0, 2)] == [1, 2]
+
+    table.update(1, status="occupied", booked_by="a")
+    assert [s["_id"] for s in table.nearest_available(0, 0, 2)] == [2, 3]
+    assert [s["_id"] for s in table.nearest_available(0, 0, 5, zone="B")] == [3]
+
+    table.update(1, status="available", booked_by=None)
+    assert table.nearest_available(0, 0, 1)[0]["_id"] == 1
+
+
+class CountingRepository(InMemoryRepository):
+    def __init__(self, docs):
+        super().__init__()
+        self.seats = {doc["_id"]: doc for doc in docs}
+        self.listed = 0
+
+    async def list_seats(self, limit=SEAT_LIST_LIMIT):
+        self.listed += 1
+        return await super().list_seats(limit)
+
+
+def office(seats=SEAT_LIST_LIMIT + 200, floors=3):
+    """Every seat taken except one per floor, all with ids past the list cap."""
+    free = {SEAT_LIST_LIMIT + floor: floor for floor in range(1, floors + 1)}
+    return [
+        {
+            "_id": i,
+            "status": "available" if i in free else "occupied",
+            "floor": free.get(i, i % floors + 1),
+            "x": 0.0 if i in free else float(i % 30),
+            "y": 0.0 if i in free else float(i // 30 % 30),
+        }
+        for i in range(1, seats + 1)
+    ]
+
+
+def recommend(monkeypatch, repo, mirror=None, **params):
+    monkeypatch.setattr(seat_mirror, "_mirror", mirror)
+    cache.seat_cache.invalidate()
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "me"}
+    app.dependency_overrides[get_read_repository] = lambda: repo
+    try:
+        return TestClient(app).get("/seats/recommend", params=params)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_recommend_without_a_mirror_sees_every_seat_on_one_floor(monkeypatch):
+    repo = CountingRepository(office())
+    for floor in (1, 2, 3):
+        response = recommend(monkeypatch, repo, x=0, y=0, floor=floor, k=5)
+        assert [(s["_id"], s["floor"]) for s in response.json()["seats"]] == [(SEAT_LIST_LIMIT + floor, floor)]
+
+
+def test_recommend_builds_the_table_once_per_generation(monkeypatch):
+    repo = CountingRepository(office())
+    recommend(monkeypatch, repo, x=0, y=0, floor=1)
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "me"}
+    app.dependency_overrides[get_read_repository] = lambda: repo
+    try:
+        client = TestClient(app)
+        client.get("/seats/recommend", params={"x": 0, "y": 0, "floor": 2})
+        assert repo.listed == 1
+        cache.seat_cache.invalidate()
+        client.get("/seats/recommend", params={"x": 0, "y": 0, "floor": 2})
+        assert repo.listed == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_recommend_uses_a_ready_mirror(monkeypatch):
+    repo = CountingRepository([])
+    mirror = SeatMirror(None)
+    mirror.table.load(office())
+    mirror.ready = True
+    response = recommend(monkeypatch, repo, mirror, x=0, y=0, floor=2)
+    assert [s["_id"] for s in response.json()["seats"]] == [SEAT_LIST_LIMIT + 2]
+    assert repo.listed == 0
+
+
+def test_recommend_centres_on_teammates_floor(monkeypatch):
+    docs = office()
+    docs[4]["booked_by"] = "mate"
+    repo = CountingRepository(docs)
+    repo.employees["mate"] = {"w3_id": "mate", "last_booked_seat": 5}
+    response = recommend(monkeypatch, repo, teammates="mate")
+    body = response.json()
+    assert body["origin"]["floor"] == docs[4]["floor"]
+    assert {s["floor"] for s in body["seats"]} == {docs[4]["floor"]}
+
+
+def test_recommend_needs_a_floor_with_coordinates(monkeypatch):
+    response = recommend(monkeypatch, CountingRepository(office()), x=0, y=0)
+    assert response.status_code == 422
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+
+import seat_mirror
+from seat_mirror import SeatMirror
+from seat_table import SeatTable, docs_from_columns
+
+
+def test_mirror_applies_change_events():
+    mirror = SeatMirror(collection=None, table=SeatTable())
+    mirror.apply({"operationType": "insert", "documentKey": {"_id": 1},
+                  "fullDocument": {"_id": 1, "status": "available", "price": 5}})
+    mirror.apply({"operationType": "update", "documentKey": {"_id": 1},
+                  "fullDocument": {"_id": 1, "status": "occupied", "price": 5, "booked_by": "a"}})
+    assert mirror.table.get(1)["status"] == "occupied"
+
+    mirror.apply({"operationType": "delete", "documentKey": {"_id": 1}})
+    assert mirror.table.get(1) is None
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "mirror.json")
+    mirror = SeatMirror(collection=None, state_path=path)
+    mirror.table.upsert({"_id": 7, "status": "occupied", "price": 5, "booked_by": "a"})
+    mirror._resume_token = {"_data": "8263"}
+    asyncio.run(mirror.checkpoint())
+
+    restored = SeatMirror(collection=None, state_path=path)
+    asyncio.run(restored.restore())
+    assert restored.table.get(7)["booked_by"] == "a"
+    assert restored._resume_token == {"_data": "8263"}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_workers_share_one_checkpoint(tmp_path):
+    path = str(tmp_path / "mirror.json")
+    mirrors = []
+    for worker in range(4):
+        mirror = SeatMirror(collection=None, state_path=path)
+        mirror.table.load([{"_id": i, "status": "available", "price": worker} for i in range(1, 2001)])
+        mirror._resume_token = {"_data": str(worker)}
+        mirrors.append(mirror)
+
+    async def run():
+        await asyncio.gather(*(m.checkpoint() for m in mirrors))
+
+    asyncio.run(run())
+    restored = SeatMirror(collection=None, state_path=path)
+    asyncio.run(restored.restore())
+    # whichever worker wrote last, its table and token belong together
+    worker = int(restored._resume_token["_data"])
+    assert {seat["price"] for seat in restored.table.rows()} == {worker}
+    assert len(restored.table) == 2000
+
+
+def test_checkpoint_encodes_off_the_loop(tmp_path, monkeypatch):
+    mirror = SeatMirror(collection=None, state_path=str(tmp_path / "mirror.json"))
+    mirror.table.load([{"_id": i, "status": "available", "price": 5, "x": 1.0, "y": 2.0} for i in range(1, 101)])
+    mirror._resume_token = {"_data": "1"}
+    assert docs_from_columns(mirror.table.columns()) == mirror.table.snapshot()
+    threads = []
+    write = seat_mirror._write_checkpoint
+    monkeypatch.setattr(seat_mirror, "_write_checkpoint", lambda *a: threads.append(threading.get_ident()) or write(*a))
+    asyncio.run(mirror.checkpoint())
+    assert threads and threads[0] != threading.get_ident()
+
+
+class BrokenCollection:
+    def __init__(self):
+        self.watches = 0
+
+    def watch(self, **kwargs):
+        self.watches += 1
+        raise KeyError("unexpected")
+
+
+def test_unexpected_failure_marks_mirror_not_ready_and_retries(monkeypatch, tmp_path):
+    monkeypatch.setattr(seat_mirror, "RETRY_SECONDS", 0.01)
+    collection = BrokenCollection()
+    mirror = SeatMirror(collection=collection, state_path=str(tmp_path / "mirror.json"))
+    mirror.ready = True
+
+    async def run():
+        await mirror.start()
+        await asyncio.sleep(0.05)
+        assert not mirror._task.done()
+        await mirror.stop()
+
+    asyncio.run(run())
+    assert mirror.ready is False
+    assert collection.watches > 1
@@ -0,0 +1,105 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import cache
+import seat_mirror
+from auth import get_current_user
+from main import app, seed
+from repository import InMemoryRepository, get_read_repository
+from seat_mirror import SeatMirror
+from seat_table import SeatTable
+
+
+def test_table_indexes_by_id_and_status():
+    table = SeatTable()
+    table.load([
+        {"_id": 2, "status": "occupied", "price": 5, "booked_by": "a"},
+        {"_id": 1, "status": "available", "price": 5},
+    ])
+    assert table.get(2)["booked_by"] == "a"
+    assert [seat["_id"] for seat in table.rows()] == [1, 2]
+    assert table.count("available") == 1
+
+    table.update(1, status="occupied", booked_by="b")
+    assert table.count("available") == 0
+    assert table.count("occupied") == 2
+
+    table.delete(2)
+    assert table.get(2) is None
+    assert len(table) == 1
+
+
+def test_unknown_status_is_left_out_instead_of_failing():
+    table = SeatTable()
+    table.upsert({"_id": 1, "status": "blocked", "price": 5})
+    table.upsert({"_id": 2, "status": "available", "price": 5})
+    assert table.get(1) is None
+    assert table.count("available") == 1
+    table.update(2, status="blocked")
+    assert table.get(2) is None
+
+
+def test_floor_bitsets_count_and_flip():
+    table = SeatTable()
+    table.load([
+        {"_id": i, "status": "available", "price": 5, "floor": 1 if i <= 3 else 2}
+        for i in range(1, 6)
+    ])
+    assert table.summary() == {1: {"available": 3, "occupied": 0}, 2: {"available": 2, "occupied": 0}}
+
+    table.update(1, status="occupied", booked_by="a")
+    assert table.count("available", floor=1) == 2
+    assert table.count("occupied") == 1
+    assert table.first("available", floor=1)["_id"] == 2
+    assert [seat["_id"] for seat in table.rows("available", floor=2)] == [4, 5]
+
+    table.upsert({"_id": 4, "status": "available", "price": 5, "floor": 1})
+    assert table.count(floor=1) == 4
+    assert table.count(floor=2) == 1
+
+
+def seats_and_summary(monkeypatch, repo, mirror=None):
+    monkeypatch.setattr(seat_mirror, "_mirror", mirror)
+    cache.seat_cache.invalidate()
+    app.dependency_overrides[get_current_user] = lambda: {"w3_id": "me"}
+    app.dependency_overrides[get_read_repository] = lambda: repo
+    try:
+        client = TestClient(app)
+        return client.get("/seats").json(), client.get("/seats/summary").json()
+    finally:
+        app.dependency_overrides.clear()
+
+
+def expected_summary(seats):
+    per_floor = Counter((seat["floor"], seat["status"]) for seat in seats)
+    floors = sorted({seat["floor"] for seat in seats})
+    return {
+        "floors": [
+            {"floor": f, "available": per_floor[f, "available"], "occupied": per_floor[f, "occupied"]}
+            for f in floors
+        ],
+        "available": sum(seat["status"] == "available" for seat in seats),
+        "occupied": sum(seat["status"] == "occupied" for seat in seats),
+    }
+
+
+def test_summary_matches_the_seat_list(monkeypatch):
+    repo = InMemoryRepository()
+    asyncio.run(seed(repo))
+    for seat_id in (1, 2, 30, 99):
+        repo.seats[seat_id].update(status="occupied", booked_by=f"user{seat_id}")
+
+    seats, summary = seats_and_summary(monkeypatch, repo)
+    assert len(summary["floors"]) == 4
+    assert summary == expected_summary(seats)
+
+    # the mirror answers from its bitsets; the counts must not change
+    mirror = SeatMirror(collection=None)
+    mirror.table.load(repo.seats.values())
+    mirror.ready, mirror.synced_at = True, datetime.utcnow()
+    seats, summary = seats_and_summary(monkeypatch, repo, mirror)
+    assert summary == expected_summary(seats)
+    assert summary["occupied"] == 4
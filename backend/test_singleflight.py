@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_read():
+    flights = SingleFlight()
+    reads = []
+
+    async def read():
+        reads.append(1)
+        await asyncio.sleep(0.01)
+        return ["seat"]
+
+    async def burst():
+        return await asyncio.gather(*(flights.do("seats", read) for _ in range(100)))
+
+    results = asyncio.run(burst())
+    assert len(reads) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.coalesced == 99
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def read():
+        attempts.append(1)
+        await asyncio.sleep(0)
+        if len(attempts) == 1:
+            raise RuntimeError("mongo down")
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(
+            flights.do("k", read), flights.do("k", read), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        return await flights.do("k", read)
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flights = SingleFlight()
+
+    async def read():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(flights.do("k", read))
+        second = asyncio.ensure_future(flights.do("k", read))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "ok"
@@ -0,0 +1,78 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import tracing
+from main import app
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+def test_span_is_noop_outside_a_trace():
+    assert tracing.span("mongo.seats.find_one") is tracing.NOOP_SPAN
+    assert tracing.current_trace_id() is None
+
+
+def test_spans_nest_under_their_parent():
+    trace = tracing.Trace(TRACE_ID)
+    with tracing.Span(trace, "root") as root:
+        with tracing.span("child", seat_id=3) as child:
+            assert tracing.current_trace_id() == TRACE_ID
+        try:
+            with tracing.span("failing"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    spans = {s["name"]: s for s in trace.spans}
+    assert spans["child"]["parent_id"] == root.span_id == spans["failing"]["parent_id"]
+    assert spans["child"]["span_id"] == child.span_id
+    assert spans["child"]["attrs"] == {"seat_id": 3}
+    assert spans["failing"]["error"] == "ValueError: boom"
+    assert tracing.span("after") is tracing.NOOP_SPAN
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-01") == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+    assert tracing.parse_traceparent("garbage") is None
+
+
+def test_middleware_propagates_incoming_trace_id():
+    exporter = tracing.InMemoryExporter()
+    tracing.configure(exporter, rate=0)
+    try:
+        client = TestClient(app)
+        response = client.get("/seats/count", headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+        assert response.status_code == 401
+        assert response.headers["x-trace-id"] == TRACE_ID
+
+        (root,) = exporter.by_name("GET /seats/count")
+        assert root["parent_id"] == "00f067aa0ba902b7"
+        assert root["attrs"]["http.status"] == 401
+        assert root["attrs"]["http.route"] == "/seats/count"
+        (auth,) = exporter.by_name("auth.get_current_user")
+        assert auth["trace_id"] == TRACE_ID
+        assert auth["parent_id"] == root["span_id"]
+        assert auth["error"].startswith("HTTPException")
+
+        # not sampled: no spans, no header
+        response = client.get("/healthz", headers={"X-Trace-Id": "abc"})
+        assert "x-trace-id" not in response.headers
+        assert len(exporter.spans) == 2
+
+        tracing.configure(exporter, rate=1.0)
+        response = client.get("/healthz", headers={"X-Trace-Id": "abc"})
+        assert response.headers["x-trace-id"] == "abc"
+        assert exporter.by_name("GET /healthz")[0]["trace_id"] == "abc"
+    finally:
+        tracing.shutdown()
+        tracing.sample_rate = tracing.TRACE_SAMPLE_RATE
+
+
+def test_json_file_exporter_writes_one_line_per_span(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.JsonFileExporter(str(path))
+    exporter.export([{"name": "a"}, {"name": "b"}])
+    exporter.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [s["name"] for s in lines] == ["a", "b"]
@@ -0,0 +1,255 @@
+# tracing.py
+# Lightweight per-request tracing: a trace id propagated from the incoming
+# request, nested spans around the calls we care about (Mongo, JWT, IdP) and
+# a pluggable exporter. When a request is not sampled, ``span()`` hands back
+# a shared no-op object, so instrumented code pays one ContextVar lookup.
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ENV
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/traces.jsonl")
+
+TRACE_ID_HEADER = "x-trace-id"
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[dict] = []
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attrs", "error", "_started", "_wall", "_token")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str] = None, attrs: Optional[dict] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attrs = attrs or {}
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self._wall = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.trace.spans.append(
+            {
+                "trace_id": self.trace.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": self._wall,
+                "duration_ms": round(duration * 1000, 3),
+                "attrs": self.attrs,
+                "error": self.error,
+            }
+        )
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def span(name: str, **attrs):
+    """Child span of the current one, or a no-op outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    parent = _current.get()
+    return parent.trace.trace_id if parent is not None else None
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+# EXPORTERS
+class Exporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NoopExporter(Exporter):
+    def export(self, spans):
+        pass
+
+
+class InMemoryExporter(Exporter):
+    """Keeps finished spans in a list; for tests."""
+
+    def __init__(self):
+        self.spans: List[dict] = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def by_name(self, name: str) -> List[dict]:
+        return [s for s in self.spans if s["name"] == name]
+
+
+class JsonFileExporter(Exporter):
+    """Appends one JSON line per span to ``path`` from a background thread,
+    so request handlers never wait on file I/O."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._drain, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans):
+        self._queue.put(spans)
+
+    def _drain(self):
+        with open(self.path, "a") as f:
+            while True:
+                spans = self._queue.get()
+                if spans is None:
+                    return
+                for s in spans:
+                    f.write(json.dumps(s, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_exporter: Exporter = NoopExporter()
+sample_rate = TRACE_SAMPLE_RATE
+
+
+def configure(exporter: Optional[Exporter] = None, rate: Optional[float] = None):
+    global _exporter, sample_rate
+    if exporter is None:
+        exporter = JsonFileExporter() if TRACE_EXPORTER == "jsonfile" else NoopExporter()
+    if exporter is not _exporter:
+        _exporter.close()
+        _exporter = exporter
+    if rate is not None:
+        sample_rate = rate
+
+
+def shutdown():
+    configure(NoopExporter())
+
+
+def get_exporter() -> Exporter:
+    return _exporter
+
+
+# PROPAGATION
+def parse_traceparent(value: str):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header."""
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """Starts the root span of a request.
+
+    The trace id comes from ``traceparent`` (whose sampled flag is honoured)
+    or ``X-Trace-Id``; otherwise a new one is made. Requests are otherwise
+    sampled at ``sample_rate``. Sampled responses carry ``X-Trace-Id``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = None
+        sampled = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parsed = parse_traceparent(value.decode("latin-1"))
+                if parsed:
+                    trace_id, parent_id, sampled = parsed
+            elif name == b"x-trace-id" and trace_id is None:
+                trace_id = value.decode("latin-1")[:64]
+        if sampled is None:
+            sampled = sample_rate > 0 and random.random() < sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id or _new_id(16))
+        root = Span(trace, f"{scope['method']} {scope['path']}", parent_id, {"http.method": scope["method"]})
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status": message["status"]})
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_ID_HEADER.encode(), trace.trace_id.encode())
+                ]
+            await send(message)
+
+        try:
+            with root:
+                await self.app(scope, receive, send_with_trace)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                root.set(**{"http.route": route.path})
+            try:
+                _exporter.export(trace.spans)
+            except Exception:
+                logger.exception("Trace export failed")
@@ -37,9 +37,13 @@ check_endpoint() {
     return 1
 }
 
-# Check backend health
-check_endpoint "${BACKEND_URL}/seats" "Backend API"
+# Check backend health (liveness, then readiness incl. MongoDB ping)
+check_endpoint "${BACKEND_URL}/healthz" "Backend API"
 BACKEND_STATUS=$?
+if [ $BACKEND_STATUS -eq 0 ]; then
+    check_endpoint "${BACKEND_URL}/readyz" "Backend readiness"
+    BACKEND_STATUS=$?
+fi
 
 # Check frontend health
 check_endpoint "${FRONTEND_URL}/" "Frontend"